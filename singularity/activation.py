@@ -0,0 +1,89 @@
+# Copyright (C) 2012 by Alex Brandt <alunduil@alunduil.com>
+#
+# singularity is freely distributable under the terms of an MIT-style license.
+# See COPYING or http://www.opensource.org/licenses/mit-license.php.
+
+import logging
+import fcntl
+import os
+import socket
+
+logger = logging.getLogger("console") # pylint: disable=C0103
+
+# First descriptor passed by a socket activating service manager.
+LISTEN_FDS_START = 3
+
+# Listening sockets passed to this process (see listen) not yet claimed by a
+# communicator.
+SOCKETS = []
+
+def listen():
+    """Listening sockets passed by a service manager (i.e. systemd).
+
+    ### Description
+
+    Follows the LISTEN_PID/LISTEN_FDS protocol: if LISTEN_PID names this
+    process LISTEN_FDS descriptors starting at LISTEN_FDS_START are listening
+    sockets created for us.  They're made close-on-exec, the variables are
+    removed (so children don't claim them) and they're recorded in SOCKETS.
+
+    Must be called before the daemon detaches (the pid changes).  Returns the
+    descriptors so they can be preserved when the daemon closes its files.
+
+    """
+
+    if os.environ.get("LISTEN_PID") != str(os.getpid()):
+        return list(SOCKETS)
+
+    count = int(os.environ.get("LISTEN_FDS") or 0)
+
+    for variable in [ "LISTEN_PID", "LISTEN_FDS", "LISTEN_FDNAMES" ]:
+        os.environ.pop(variable, None)
+
+    for descriptor in range(LISTEN_FDS_START, LISTEN_FDS_START + count):
+        flags = fcntl.fcntl(descriptor, fcntl.F_GETFD)
+        fcntl.fcntl(descriptor, fcntl.F_SETFD, flags | fcntl.FD_CLOEXEC)
+
+        SOCKETS.append(descriptor)
+
+    logger.info("Inherited listening sockets: %s", SOCKETS)
+
+    return list(SOCKETS)
+
+def notify(*assignments):
+    """Send the state assignments to the service manager's NOTIFY_SOCKET.
+
+    ### Description
+
+    Does nothing (and returns False) if no NOTIFY_SOCKET was passed.  The
+    variable is left in the environment so a successor started by a handoff
+    can announce itself (with its MAINPID) as well.
+
+    ### Examples
+
+    >>> notify("READY=1", "MAINPID={0}".format(os.getpid()))
+    True
+
+    """
+
+    address = os.environ.get("NOTIFY_SOCKET")
+
+    if not address:
+        return False
+
+    if address.startswith("@"): # Abstract namespace.
+        address = "\0" + address[1:]
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+
+    try:
+        client.sendto("\n".join(assignments), address)
+    except socket.error as error:
+        logger.warning("Unable to notify %s: %s", address, error)
+        return False
+    finally:
+        client.close()
+
+    logger.info("Notified the service manager: %s", assignments)
+
+    return True
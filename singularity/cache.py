@@ -12,6 +12,10 @@ from singularity.parameters import SingularityParameters
 
 logger = logging.getLogger("console") # pylint: disable=C0103
 
+# Directory (relative to the cache) holding the daemon's persistent state.
+# It is not part of the dict-like cache and is never applied.
+STATE = ".state"
+
 class SingularityCache(object): # pylint: disable=R0903
     """Dict-like interface for the cache directory for singularity.
 
@@ -37,7 +41,7 @@ class SingularityCache(object): # pylint: disable=R0903
 
     def iterfiles(self): # pylint: disable=R0201
         """Generator of list of files in the cache."""
-        return itertools.chain(*[ [ os.path.join(file_[0], name) for name in file_[2] ] for file_ in os.walk(SingularityParameters()["main.cache"]) if len(file_[2]) ]) # pylint: disable=C0301
+        return itertools.chain(*[ [ os.path.join(file_[0], name) for name in file_[2] ] for file_ in _walk(SingularityParameters()["main.cache"]) if len(file_[2]) ]) # pylint: disable=C0301
 
     def __len__(self):
         """Number of files in the cache."""
@@ -160,3 +164,29 @@ def cache_path(function, filename):
 
     return os.path.join(SingularityParameters()["main.cache"], function, filename[1:]) # pylint: disable=C0301
 
+def state_path(name):
+    """Return the path of the named daemon state file.
+
+    ### Description
+
+    State files live in the cache directory (so they survive a reboot) but
+    are kept out of the items SingularityCache presents.
+
+    ### Examples
+
+    Assuming a default cache location:
+
+    >>> state_path("fingerprints")
+    '/var/cache/singularity/.state/fingerprints'
+
+    """
+
+    return os.path.join(SingularityParameters()["main.cache"], STATE, name)
+
+def _walk(directory):
+    """os.walk of the cache directory without the state directory."""
+    for root, dirs, files in os.walk(directory):
+        if root == directory and STATE in dirs:
+            dirs.remove(STATE)
+        yield root, dirs, files
+
@@ -5,7 +5,10 @@
 
 import logging
 
-from singularity import helpers
+# Not "from singularity import helpers": importing the communicators'
+# helpers submodule rebinds helpers in this package and create would then
+# fail the next time it's called (i.e. after a failed handoff).
+from singularity.helpers import VIRTUAL
 
 logger = logging.getLogger("console") # pylint: disable=C0103
 
@@ -22,11 +25,17 @@ def create(*args, **kwargs):
     since this is not dynamically pluggable it acts as a check that nothing
     blatant is missing upon release.
 
+    A handoff keyword argument (the state returned by a predecessor's
+    Communicator.handoff) lets the communicator pick up where the previous
+    daemon left off.  A journal keyword argument (see SingularityJournal) is
+    used by communicators that hold messages before they're received (see
+    Communicator.entry).
+
     """
 
     communicator = None
 
-    if helpers.VIRTUAL == "xenU":
+    if VIRTUAL == "xenU":
         from singularity.communicators.xencommunicator import XenCommunicator
         communicator = XenCommunicator(*args, **kwargs)
     # TODO Add KVM
@@ -58,6 +67,8 @@ class Communicator(object):
         in the singularity.configurators.SingularityConfigurator.runnable
         documentation.
 
+        Returns (None, None) instead if woken while waiting (see wake).
+
         """
 
         raise NotImplementedError("class {0} does not implement 'receive(self)'".format(self.__class__.__name__)) # pylint: disable=C0301
@@ -81,3 +92,88 @@ class Communicator(object):
 
         raise NotImplementedError("class {0} does not implement 'send(self, message)'".format(self.__class__.__name__)) # pylint: disable=C0301
 
+    def handoff(self, identifiers): # pylint: disable=R0201,W0613
+        """Stop receiving and return the state to hand to a successor.
+
+        ### Arguments
+
+        Argument    | Description
+        --------    | -----------
+        identifiers | The identifiers of the messages being handed off.
+
+        ### Description
+
+        Returns a tuple of the state (JSON serializable) passed as the handoff
+        argument to the successor's communicator and the file descriptors the
+        successor must inherit.  Messages received but not yet returned by
+        receive are included in the state.
+
+        After this is called receive must not be called again (unless the
+        handoff is taken back; see takeback) but send still answers the
+        messages that were not handed off.
+
+        """
+
+        return {}, []
+
+    def takeback(self, state): # pylint: disable=R0201,W0613
+        """Undo handoff when no successor took the state it returned.
+
+        ### Arguments
+
+        Argument | Description
+        -------- | -----------
+        state    | The state returned by handoff
+
+        ### Description
+
+        The messages handoff took are received (and answered) by this
+        communicator again and it goes back to receiving new messages.  The
+        communicator itself is kept (rather than a new one created from the
+        state) as it still answers the messages being handled.
+
+        """
+
+        pass
+
+    def entry(self, identifier): # pylint: disable=R0201,W0613
+        """The journal entry of a message returned by receive.
+
+        ### Description
+
+        Communicators that take messages off the hypervisor's channel before
+        receive returns them (i.e. XenCommunicator) journal them first and
+        hand the entry to the daemon here (once) so it's finished when the
+        message is answered.  Returns None if the message wasn't journalled
+        and the daemon journals it itself.
+
+        """
+
+        return None
+
+    def wake(self): # pylint: disable=R0201
+        """Make a receive waiting for a message return (None, None).
+
+        ### Description
+
+        Called from another thread than the one receiving (i.e. when the
+        daemon is asked to hand off) so the receiving thread can act without
+        waiting for the next message.  The default implementation does
+        nothing; receive simply returns with the next message.
+
+        """
+
+        pass
+
+    def reload(self): # pylint: disable=R0201
+        """Forget anything derived from the configurators or configuration.
+
+        ### Description
+
+        Called by the daemon once a reload (HUP) has rebuilt the configurators
+        so values cached from the previous configurators are recomputed.
+
+        """
+
+        pass
+
@@ -9,6 +9,8 @@ import os
 
 logger = logging.getLogger(__name__) # pylint: disable=C0103
 
+SYS_NET = os.path.join(os.path.sep, "sys", "class", "net")
+
 def translate(message): # pylint: disable=R0912,R0915
     """Translate the expected message to the new format.
 
@@ -266,22 +268,32 @@ def translate(message): # pylint: disable=R0912,R0915
 
     return message
 
-def interface(mac_address):
-    """The interface name for the given MAC address."""
+def nics():
+    """Interface names mapped to their MAC addresses.
+
+    ### Description
+
+    The addresses are read from /sys/class/net on every call (a read per
+    interface) rather than cached: an interface can keep its name while its
+    address changes (i.e. a replaced vif or a guest cloned from an image).
+
+    """
 
-    # TODO Merge with mac_addresses?
     # TODO Other OS's?
 
-    sys_net = os.path.join(os.path.sep, "sys", "class", "net")
+    result = {}
 
-    nics = {}
-    for nic in os.listdir(sys_net):
-        with open(os.path.join(sys_net, nic, "address")) as mac:
-            nics[mac.read().strip().lower()] = nic
+    for nic in os.listdir(SYS_NET):
+        with open(os.path.join(SYS_NET, nic, "address")) as mac:
+            result[nic] = mac.read().strip().lower()
 
-    logger.debug("Found MACs: %s", nics)
+    logger.debug("Found MACs: %s", result)
 
-    return nics[mac_address.lower()]
+    return result
+
+def interface(mac_address):
+    """The interface name for the given MAC address."""
+    return dict([ (mac, nic) for nic, mac in sorted(nics().iteritems()) ])[mac_address.lower()] # pylint: disable=C0301
 
 def cidr(ip, netmask): # pylint: disable=C0103
     """Converts an IP and Netmask into CIDR notation."""
@@ -301,16 +313,5 @@ def cidr(ip, netmask): # pylint: disable=C0103
 
 def macs():
     """Gets all mac addresses on the system."""
-
-    # TODO Merge with interface()?
-    # TODO Other OS's?
-
-    sys_net = os.path.join(os.path.sep, "sys", "class", "net")
-
-    macs = [] # pylint: disable=W0621
-    for nic in os.listdir(sys_net):
-        with open(os.path.join(sys_net, nic, "address")) as mac:
-            macs.append(mac.read().strip().lower())
-
-    return macs
+    return nics().values()
 
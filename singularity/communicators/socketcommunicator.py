@@ -4,10 +4,15 @@
 # See COPYING or http://www.opensource.org/licenses/mit-license.php.
 
 import logging
+import errno
+import itertools
+import fcntl
 import os
+import select
 import socket
 import json
 
+import singularity.activation as activation
 import singularity.communicators.helpers as helpers
 
 from singularity.communicators import Communicator
@@ -16,11 +21,45 @@ from singularity.parameters import SingularityParameters
 logger = logging.getLogger(__name__) # pylint: disable=C0103
 
 class SocketCommunicator(Communicator):
-    def __init__(self, path = None, *args, **kwargs):
+    def __init__(self, path = None, handoff = None, journal = None, *args, **kwargs): # pylint: disable=C0301,W0613
+        # The journal isn't used; messages are read from their connection by
+        # receive so none are held before the daemon journals them.
         super(SocketCommunicator, self).__init__(*args, **kwargs)
 
         path = path or SingularityParameters()["socket_communicator.path"] or os.path.join(SingularityParameters()["main.cache"], "singularity.sock") # pylint: disable=C0301
 
+        # Connections waiting on a response keyed by message identifier.  The
+        # daemon may accept the next message before answering this one.
+        self.connections = {}
+        self._identifiers = itertools.count()
+
+        # A byte written here wakes receive (see wake).
+        self._wakeup = os.pipe()
+
+        for descriptor in self._wakeup:
+            flags = fcntl.fcntl(descriptor, fcntl.F_GETFD)
+            fcntl.fcntl(descriptor, fcntl.F_SETFD, flags | fcntl.FD_CLOEXEC)
+
+        if handoff is None and len(activation.SOCKETS):
+            logger.info("Using the inherited listening socket, %s", activation.SOCKETS[0]) # pylint: disable=C0301
+            handoff = {
+                    "socket": activation.SOCKETS.pop(0),
+                    "connections": {},
+                    "identifier": 0,
+                    }
+
+        if handoff is not None:
+            logger.info("Taking over socket at %s", path)
+
+            self.socket = fromfd(handoff["socket"])
+
+            for identifier, descriptor in handoff["connections"].iteritems(): # pylint: disable=C0301
+                self.connections[identifier] = fromfd(descriptor)
+
+            self._identifiers = itertools.count(handoff["identifier"])
+
+            return
+
         logger.info("Setting up socket at %s", path)
 
         self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
@@ -30,10 +69,50 @@ class SocketCommunicator(Communicator):
 
         self.socket.bind(path)
         self.socket.listen(0) # To best emulate a hypervisor we only allow one connection. # pylint: disable=C0301
-        self.connection = None
+
+    def handoff(self, identifiers):
+        """The listening socket and the connections of identifiers.
+
+        ### Description
+
+        The successor inherits the listening socket (connections attempted in
+        the meantime wait in its backlog) and the connections of the messages
+        handed off so it can answer them.
+
+        """
+
+        connections = dict([ (identifier, self.connections.pop(identifier)) for identifier in identifiers if identifier in self.connections ]) # pylint: disable=C0301
+
+        # Kept open until this daemon exits so the descriptors are inherited.
+        self._handoff = connections # pylint: disable=W0201
+
+        state = {
+                "socket": self.socket.fileno(),
+                "connections": dict([ (identifier, connection.fileno()) for identifier, connection in connections.iteritems() ]), # pylint: disable=C0301
+                "identifier": next(self._identifiers),
+                }
+
+        return state, [ self.socket.fileno() ] + [ connection.fileno() for connection in connections.itervalues() ] # pylint: disable=C0301
+
+    def takeback(self, state):
+        """Answer the connections handed off again (see handoff).
+
+        ### Description
+
+        The listening socket was never closed so receive simply carries on.
+
+        """
+
+        self.connections.update(self._handoff)
+        self._handoff = {} # pylint: disable=W0201
+
+    def wake(self):
+        """Make receive return (None, None) through the wakeup pipe."""
+        os.write(self._wakeup[1], "\0")
 
     def __del__(self):
-        self.connection.close()
+        for connection in self.connections.itervalues():
+            connection.close()
 
     def receive(self):
         """Recieve message from the user and package for upstream consumption
@@ -42,14 +121,33 @@ class SocketCommunicator(Communicator):
 
         Wait for a connection and read a message.
 
+        The wait is resumed when a signal handled by the daemon (i.e. the HUP
+        sent by its watcher) interrupts it.
+
         """
 
-        identifier = hash(self) # Purely for API consistency.
+        while True:
+            try:
+                readable = select.select([ self.socket, self._wakeup[0] ], [], [])[0] # pylint: disable=C0301
+
+                if self._wakeup[0] in readable:
+                    os.read(self._wakeup[0], 1)
+                    return None, None
+
+                connection, address = self.socket.accept() # pylint: disable=W0612,C0301
+                break
+            except (select.error, socket.error) as error:
+                if error.args[0] != errno.EINTR:
+                    raise
 
-        self.connection, address = self.socket.accept() # pylint: disable=W0612
+                logger.debug("Interrupted waiting for a connection; waiting again.") # pylint: disable=C0301
+
+        identifier = str(next(self._identifiers))
+
+        self.connections[identifier] = connection
 
         message = ""
-        messages = self.connection.makefile("r")
+        messages = connection.makefile("r")
         while True:
             piece = messages.readline().strip()
 
@@ -80,9 +178,32 @@ class SocketCommunicator(Communicator):
             "message": message,
             })
 
+        connection = self.connections.pop(identifier, None)
+
+        if connection is None: # I.e. a message resumed from the journal.
+            logger.warning("No connection for message, %s, to respond on", identifier) # pylint: disable=C0301
+            return
+
         try:
-            self.connection.send(message) # This method does exist! I swear! pylint: disable=E1101,C0301
+            connection.send(message) # This method does exist! I swear! pylint: disable=E1101,C0301
         except socket.error as error:
             if error.errno != 32: # No listener present!
                 raise
+        finally:
+            connection.close()
+
+
+def fromfd(descriptor):
+    """Socket object for an inherited descriptor (which is then closed).
+
+    ### Description
+
+    Only for descriptors inherited by a new process (a successor or a daemon
+    started by a service manager) as no other socket object may own them.
+
+    """
+
+    result = socket.fromfd(descriptor, socket.AF_UNIX, socket.SOCK_STREAM)
+    os.close(descriptor)
 
+    return result
@@ -4,9 +4,12 @@
 # See COPYING or http://www.opensource.org/licenses/mit-license.php.
 
 import logging
+import collections
 import json
 import Queue
 import sys
+import threading
+import time
 
 import xen.xend.xenstore.xsutil as xs # pylint: disable=F0401
 
@@ -17,9 +20,31 @@ import singularity.communicators.helpers as helpers
 from singularity.communicators import Communicator
 from singularity.helpers import crypto
 from singularity.configurators.features import FeaturesConfigurator
+from singularity.parameters import SingularityParameters
 
 logger = logging.getLogger(__name__) # pylint: disable=C0103
 
+# Attempts made at a xenstore transaction that conflicts with another writer
+# (i.e. the hypervisor updating vm-data) before its last result is used.
+TRANSACTION_ATTEMPTS = 5
+
+# Functions that need translating or are answered by XenCommunicator (without
+# reaching the configurators) mapped to the names of their handlers (see
+# XenCommunicator.receive).
+HANDLERS = {
+        "resetnetwork": "_resetnetwork",
+        "keyinit": "_keyinit",
+        "version": "_version",
+        "password": "_password",
+        }
+
+# Functions the hypervisor sends under a different name than the
+# configurators use.
+RENAMES = {
+        "injectfile": "file",
+        "agentupdate": "update",
+        }
+
 class XenCommunicator(Communicator):
     """An attempt at introspecting the Openstack communication protocol.
 
@@ -209,7 +234,7 @@ class XenCommunicator(Communicator):
 
     """
 
-    def __init__(self, receive_prefix = "data/host", send_prefix = "data/guest", data_prefix = "vm-data", *args, **kwargs): # pylint: disable=C0301
+    def __init__(self, receive_prefix = "data/host", send_prefix = "data/guest", data_prefix = "vm-data", handoff = None, journal = None, *args, **kwargs): # pylint: disable=C0301,R0913
         """Initialize a communication "bus" with the Xen Hypervisor.
 
         ### Description
@@ -217,58 +242,154 @@ class XenCommunicator(Communicator):
         Sets up watches on paths we'll be receiving data on in xenstore and 
         initializes pathing information used elsewhere.
 
+        If handoff (see XenCommunicator.handoff) is passed the predecessor's
+        received messages are queued first and its keyinit session restored.
+
+        If a journal (see SingularityJournal) is passed every message is
+        journalled before it's removed from xenstore (see _drain) and the
+        messages a previous daemon removed but never passed on are queued
+        first.
+
         """
 
         super(XenCommunicator, self).__init__(*args, **kwargs)
 
         self._receive_prefix = receive_prefix
         self._send_prefix = send_prefix
+        self._data_prefix = data_prefix
         self._network_prefix = data_prefix + "/networking"
         self._hostname_prefix = data_prefix + "/hostname"
 
         self._queue = Queue.Queue()
 
+        # The features reply of the current configurators and the reply sent
+        # to the hypervisor in its place (see send).
+        self._features = None
+
+        # Passwords waiting for a keyinit by identifier: (path, message, time
+        # parked).
+        self._passwords = collections.OrderedDict()
+
+        # Journal entries of the messages removed from data/host but not yet
+        # returned by receive by identifier (see entry).
+        self.journal = journal
+        self._entries = {}
+
+        if handoff is not None:
+            for path, message in handoff["queue"]:
+                self._queue.put((path, message))
+
+            self._entries.update(handoff.get("entries", {}))
+
+            crypto.PRIVATE_KEY = handoff["crypto"]["private"]
+            crypto.PUBLIC_KEY = handoff["crypto"]["public"]
+            crypto.SHARED_KEY = handoff["crypto"]["shared"]
+
+            if handoff["crypto"]["aes"]:
+                crypto.AES_KEYS = crypto.aes_keys(crypto.SHARED_KEY)
+        elif journal is not None:
+            for record in journal.unfinished:
+                if not record.get("raw") or record["message"] is None:
+                    continue # Resumed or answered by the daemon.
+
+                logger.info("Resuming message, %s, from the journal", record["identifier"]) # pylint: disable=C0301
+
+                self._queue.put((self._receive_prefix + "/" + record["identifier"], record["message"])) # pylint: disable=C0301
+                self._entries[record["identifier"]] = record["entry"]
+
         self.xs = xs.xshandle() # pylint: disable=C0103
 
+        self.watches = []
+        self._watch()
+
+    def _watch(self):
+        """Watch data/host and queue the messages already waiting there."""
+
         def xs_watch(path):
             logger.info("Received a watch even on %s", path)
 
-            if path in [ self._receive_prefix, data_prefix ]:
+            if path in [ self._receive_prefix, self._data_prefix ]:
                 return True
 
-            transaction = self.xs.transaction_start()
-            message = self.xs.read(transaction, path)
-            self.xs.transaction_end(transaction)
-
-            logger.info("Received message, %s", message)
-
-            self._queue.put((path, message))
-
-            transaction = self.xs.transaction_start()
-            message = self.xs.rm(transaction, path)
-            self.xs.transaction_end(transaction)
+            self._drain()
 
             return True
 
-        self.watches = []
         self.watches.append(xswatch(self._receive_prefix, xs_watch))
 
-        transaction = self.xs.transaction_start()
-        entries = self.xs.ls(transaction, self._receive_prefix)
-        self.xs.transaction_end(transaction)
-
-        logger.debug("Missed messages: %s", entries)
+        logger.debug("Replaying missed messages")
 
-        if entries is not None:
-            for path in [ self._receive_prefix + "/" + entry for entry in entries ]: # pylint: disable=C0301
-                xs_watch(path)
+        self._drain()
 
     def __del__(self):
         logger.info("XenCommunicator watches are being removed.")
         for watch in self.watches:
             watch.unwatch()
 
-    def receive(self): # pylint: disable=R0912
+    def handoff(self, identifiers):
+        """The messages read from xenstore but not received and the session.
+
+        ### Description
+
+        The watches are removed first so anything written to data/host from
+        now on stays there for the successor's startup scan.  The keyinit
+        session is handed over so a password following a keyinit can still
+        be decrypted; passwords still waiting for a keyinit are handed over
+        with the queued messages.  Messages being handled are answered by this
+        daemon through xenstore so identifiers needs no special treatment.
+
+        """
+
+        for watch in self.watches:
+            watch.unwatch()
+        self.watches = []
+
+        queue = [ (path, message) for path, message, parked in self._passwords.itervalues() ] # pylint: disable=C0301
+        self._passwords.clear()
+
+        entries = dict(self._entries)
+        self._entries.clear()
+
+        while True:
+            try:
+                path, message = self._queue.get_nowait()
+            except Queue.Empty:
+                break
+
+            if path is not None: # Not a wake.
+                queue.append((path, message))
+
+        state = {
+                "queue": queue,
+                "entries": entries,
+                "crypto": {
+                    "private": crypto.PRIVATE_KEY,
+                    "public": crypto.PUBLIC_KEY,
+                    "shared": crypto.SHARED_KEY,
+                    "aes": crypto.AES_KEYS is not None,
+                    },
+                }
+
+        return state, []
+
+    def takeback(self, state):
+        """Queue the messages handed off again and watch data/host again.
+
+        ### Description
+
+        Messages written to data/host since handoff removed the watches are
+        queued (after the messages handed off) by the startup scan.
+
+        """
+
+        for path, message in state["queue"]:
+            self._queue.put((path, message))
+
+        self._entries.update(state.get("entries", {}))
+
+        self._watch()
+
+    def receive(self):
         """Recieve message from hypervisor and package for upstream consumption
 
         ### Description
@@ -276,115 +397,433 @@ class XenCommunicator(Communicator):
         Wait for the watch to return some data and then pass that data to the
         caller.
 
+        Messages are routed through the HANDLERS table by their function.  A
+        handler returns the message to pass to the caller or None if it
+        answered (or parked) the message itself, in which case we simply wait
+        for the next message.
+
+        A message whose handler raises (i.e. networking for a MAC address no
+        interface has) is answered with the error instead of ending receive.
+
         """
 
-        message = None
-        while message is None:
-            path, message = self._queue.get(timeout = sys.maxint)
+        while True:
+            try:
+                path, message = self._queue.get(timeout = self._expire())
+            except Queue.Empty:
+                continue
+
             logger.debug("Current message at path, %s: %s", path, message)
 
-        identifier = path.replace(self._receive_prefix + "/", "")
+            if path is None: # See wake.
+                return None, None
 
-        logger.info("Received identifier, %s", identifier)
-        logger.info("Translating message: %s", message)
-        logger.info("Type of message: %s", type(message))
+            if message is None:
+                continue
 
-        if type(message) is str:
-            message = helpers.translate(message)
+            identifier = path.replace(self._receive_prefix + "/", "")
 
-        if "function" in message:
-            if message["function"] == "resetnetwork":
-                msg = [] 
+            logger.info("Received identifier, %s", identifier)
+            logger.info("Translating message: %s", message)
+            logger.info("Type of message: %s", type(message))
 
-                # TODO Is this check necessary or should we just go for the 
-                # TODO data?
+            if isinstance(message, basestring): # unicode if resumed.
+                message = helpers.translate(message)
 
-                macs = set([ mac.replace(":", "") for mac in helpers.macs() if int(mac.replace(":", ""), 16) ]) # pylint: disable=C0301
-                logger.debug("MAC Addresses: %s", macs)
+            function = message.get("function")
 
-                # TODO Is there a better way than a busy wait?
-                # MAC Addresses are upper in next gen but lower in first gen
-                # Why do things like this happen?
+            if function in HANDLERS:
+                try:
+                    message = getattr(self, HANDLERS[function])(identifier, path, message) # pylint: disable=C0301
+                except Exception as error: # pylint: disable=W0703
+                    logger.exception(error)
+                    self.send(identifier, str(error), 1)
+                    self._finish(identifier)
+                    continue
 
-                entries = set()
-                while set([ entry.lower() for entry in entries ]) < set([ mac.lower() for mac in macs ]): # Required since we can't assume anything about the entries coming back ... pylint: disable=C0301
-                    transaction = self.xs.transaction_start()
-                    entries = set(self.xs.ls(transaction, self._network_prefix))
-                    self.xs.transaction_end(transaction)
+            if message is None:
+                if identifier not in self._passwords: # Answered.
+                    self._finish(identifier)
+                continue
 
-                    logger.debug("Entries: %s", entries)
+            if function in RENAMES:
+                message["function"] = RENAMES[function]
 
-                for entry in entries:
-                    transaction = self.xs.transaction_start()
-                    msg.append(self.xs.read(transaction, self._network_prefix + "/" + entry)) # pylint: disable=C0301
-                    self.xs.transaction_end(transaction)
+            logger.debug("Passing back identifier, %s, message, %s", identifier, message) # pylint: disable=C0301
 
-                logger.debug("Message: %s", message)
+            return identifier, message
 
-                for item in msg:
-                    tmp = helpers.translate(item)
+    def _resetnetwork(self, identifier, path, message): # pylint: disable=W0613
+        """Add the networking and hostname from vm-data to the message."""
 
-                    logger.debug("Adding in items: %s", tmp)
+        # TODO Is this check necessary or should we just go for the 
+        # TODO data?
 
-                    if "ips" in tmp:
-                        if "ips" not in message:
-                            message["ips"] = {}
-                        message["ips"].update(tmp.pop("ips"))
+        macs = set([ mac.replace(":", "") for mac in helpers.macs() if int(mac.replace(":", ""), 16) ]) # pylint: disable=C0301
+        logger.debug("MAC Addresses: %s", macs)
 
-                    if "routes" in tmp:
-                        if "routes" not in message:
-                            message["routes"] = {}
-                        message["routes"].update(tmp.pop("routes"))
+        self._networking(macs)
 
-                    message.update(tmp)
+        msg, hostname = self._vm_data()
 
-                    logger.debug("Message: %s", message)
-                
-                msg = None
+        logger.debug("Message: %s", message)
 
-                transaction = self.xs.transaction_start()
-                if self.xs.ls(transaction, self._hostname_prefix) is not None:
-                    msg = self.xs.read(transaction, self._hostname_prefix)
-                self.xs.transaction_end(transaction)
+        for item in msg:
+            tmp = helpers.translate(item)
+
+            logger.debug("Adding in items: %s", tmp)
+
+            if "ips" in tmp:
+                if "ips" not in message:
+                    message["ips"] = {}
+                message["ips"].update(tmp.pop("ips"))
+
+            if "routes" in tmp:
+                if "routes" not in message:
+                    message["routes"] = {}
+                message["routes"].update(tmp.pop("routes"))
+
+            message.update(tmp)
+
+            logger.debug("Message: %s", message)
+        
+        logger.debug("Found the hostname: %s", hostname)
+
+        if hostname is not None:
+            message["hostname"] = hostname
+
+        return message
+
+    def _keyinit(self, identifier, path, message): # pylint: disable=W0613
+        """Answer keyinit with our half of the key exchange."""
+
+        crypto.generate_keys(message["arguments"])
+
+        logger.debug("Type of the key: %s", type(crypto.PUBLIC_KEY))
+
+        self.send(identifier, str(crypto.PUBLIC_KEY), "D0")
+
+        for password, (path_, message_, parked) in self._passwords.items(): # pylint: disable=W0612,C0301
+            logger.info("Releasing password, %s, after keyinit, %s", password, identifier) # pylint: disable=C0301
+            self._queue.put((path_, message_))
+
+        self._passwords.clear()
+
+    def _version(self, identifier, path, message): # pylint: disable=W0613
+        """Answer version with the protocol version."""
+
+        logger.info("Faking the version passed back ...")
+
+        # Apparently it's a protocol version ...
+        self.send(identifier, "0.0.1.36")
+
+    def _password(self, identifier, path, message):
+        """Decrypt the password or park it until a keyinit arrives."""
+
+        if crypto.AES_KEYS is None:
+            logger.info("Holding password, %s, until a keyinit arrives", identifier) # pylint: disable=C0301
+            self._passwords[identifier] = (path, message, time.time())
+            return None
+
+        logger.info("Decrypting password")
+        message["password"] = crypto.decrypt(message["arguments"])
+        logger.debug("Password: encrypted => %s; decrypted => %s", message["arguments"], message["password"]) # pylint: disable=C0301
+        crypto.AES_KEYS = None
+
+        return message
+
+    def entry(self, identifier):
+        """The journal entry of a message receive returned (or None)."""
+        return self._entries.pop(identifier, None)
+
+    def _finish(self, identifier):
+        """Journal the completion of a message answered here."""
+        if self.journal is not None:
+            self.journal.finish(self._entries.pop(identifier, None))
+
+    def wake(self):
+        """Queue the marker that makes receive return (None, None)."""
+        self._queue.put((None, None))
+
+    def reload(self):
+        """Forget the features reply of the previous configurators."""
+
+        self._features = None
+
+    def features(self):
+        """The features reply and the reply the hypervisor expects instead.
+
+        ### Description
+
+        Computed once per generation of configurators (see reload) rather
+        than on every send, which would walk and re-import every configurator
+        each time.
+
+        """
 
-                logger.debug("Found the hostname: %s", msg)
+        # I'm getting used to lying to the hypervisor but this is ridiculous.
+        features = FeaturesConfigurator().content({})["message"]
+
+        message = []
+
+        feature_mapping = {
+                "resetnetwork": set(["hosts", "network", "resolvers"]),
+                "injectfile": set(["file"]),
+                "agentupdate": set(["update"]),
+                }
+
+        remaining = set(features.split(','))
+
+        for result, items in feature_mapping.iteritems():
+            if items & remaining:
+                message.append(result)
+                remaining -= items
+
+        message.extend(remaining)
+        message.append("keyinit") # Built-in to the communicator ...
+
+        # The following are required for instances to start on build ...
+        # Potentially restating items here in the event that other code
+        # specifying these actions is removed.
+        message.append("version")
+        message.append("features")
+        message.append("resetnetwork")
+        message.append("keyinit")
+        message.append("password")
+
+        self._features = (features, ",".join(list(set(message))))
+
+        return self._features
+
+    def _expire(self):
+        """Answer passwords held too long and return seconds to the next.
+
+        ### Description
+
+        Passwords parked for daemon.keyinit seconds without a keyinit arriving
+        are answered with an error.  Returns the time until the next parked
+        password expires (sys.maxint if there isn't one) for use as the
+        timeout waiting on the queue.
+
+        """
+
+        deadline = float(SingularityParameters()["daemon.keyinit"] or 0)
+
+        if not len(self._passwords) or not deadline:
+            return sys.maxint
+
+        for identifier, (path, message, parked) in self._passwords.items(): # pylint: disable=W0612,C0301
+            if time.time() - parked < deadline:
+                continue
+
+            logger.warning("No keyinit received within %s seconds for password, %s", deadline, identifier) # pylint: disable=C0301
+
+            del self._passwords[identifier]
+
+            self.send(identifier, "No keyinit received within {0} seconds; please retry".format(deadline), 1) # pylint: disable=C0301
+            self._finish(identifier)
+
+        if not len(self._passwords):
+            return sys.maxint
+
+        return max(0, min([ parked for path, message, parked in self._passwords.itervalues() ]) + deadline - time.time()) # pylint: disable=C0301
+
+    def _transaction(self, operation, attempts = TRANSACTION_ATTEMPTS):
+        """Result of operation(transaction) run in a xenstore transaction.
+
+        ### Arguments
+
+        Argument  | Description
+        --------  | -----------
+        operation | Callable taking the transaction and returning the result
+        attempts  | Attempts before the last result is used (None for no limit)
+
+        ### Description
+
+        If the transaction conflicts with another writer (transaction_end
+        returns False) the operation is run again in a new transaction up to
+        attempts times.  The result of the last attempt is used if every
+        attempt conflicts, which is only acceptable for read-only operations;
+        operations that write must pass None to retry until committed.
+
+        """
+
+        attempt = 0
+
+        while attempts is None or attempt < attempts:
+            attempt += 1
+
+            transaction = self.xs.transaction_start()
+
+            try:
+                result = operation(transaction)
+            except: # pylint: disable=W0702
+                self.xs.transaction_end(transaction, True) # Abort.
+                raise
+
+            if self.xs.transaction_end(transaction):
+                return result
+
+            logger.info("xenstore transaction conflicted (attempt %s of %s)", attempt, attempts) # pylint: disable=C0301
+
+        logger.warning("xenstore transaction kept conflicting; using the last result.") # pylint: disable=C0301
+
+        return result
+
+    def _drain(self):
+        """Queue every message waiting in data/host and remove them.
+
+        ### Description
+
+        The entries are listed, read and removed in a single transaction so a
+        burst of messages costs one transaction rather than two per message.
+        The messages are queued together, in the order listed, once the
+        transaction has been committed.  A conflicting transaction (i.e.
+        with the startup replay draining concurrently) is retried until it
+        commits so a message is never queued without having been removed.
 
-                if msg is not None:
-                    message["hostname"] = msg
+        Each message is journalled (see entry) before the transaction removing
+        it commits so a message is never removed without being journalled.
+        The entries of messages a conflicting attempt read but the committed
+        attempt didn't remove are finished again.
 
-            elif message["function"] == "injectfile":
-                message["function"] = "file"
+        """
+
+        accepted = {} # (identifier, message) => entry; across attempts.
+
+        def drain(transaction):
+            """Read and remove the entries in transaction."""
+
+            messages = []
+
+            for entry in self.xs.ls(transaction, self._receive_prefix) or []:
+                path = self._receive_prefix + "/" + entry
+
+                message = self.xs.read(transaction, path)
+                self.xs.rm(transaction, path)
 
-            elif message["function"] == "agentupdate":
-                message["function"] = "update"
+                if message is not None:
+                    if (entry, message) not in accepted:
+                        accepted[(entry, message)] = self._accept(entry, message) # pylint: disable=C0301
 
-            elif message["function"] == "keyinit":
-                crypto.generate_keys(message["arguments"])
+                    messages.append((path, message))
 
-                logger.debug("Type of the key: %s", type(crypto.PUBLIC_KEY))
+            return messages
+
+        messages = self._transaction(drain, None)
+
+        removed = set([ (path.replace(self._receive_prefix + "/", ""), message) for path, message in messages ]) # pylint: disable=C0301
+
+        for key, entry in accepted.iteritems():
+            if key in removed:
+                self._entries[key[0]] = entry
+            elif self.journal is not None:
+                self.journal.finish(entry)
+
+        for path, message in messages:
+            logger.info("Received message, %s", message)
+            self._queue.put((path, message))
+
+    def _accept(self, identifier, message):
+        """Journal a message read from data/host and return its entry."""
+
+        if self.journal is None:
+            return None
+
+        # Passwords are journalled without their content; see
+        # SingularityJournal.
+        try:
+            password = helpers.translate(message).get("function") == "password" # pylint: disable=E1103,C0301
+        except Exception: # pylint: disable=W0703
+            password = True # Can't tell; keep it off the disk.
+
+        return self.journal.accept(identifier, None if password else message, raw = True) # pylint: disable=C0301
+
+    def _vm_data(self):
+        """Networking entries and hostname from one snapshot of vm-data.
+
+        ### Description
+
+        Lists and reads every networking entry and the hostname in a single
+        transaction so the hypervisor's data is read consistently and in one
+        round of xenstored requests rather than a transaction per read.
+
+        Returns a tuple of the list of networking entries (strings) and the
+        hostname (None if there isn't one).
+
+        """
 
-                self.send(identifier, str(crypto.PUBLIC_KEY), "D0")
-                return self.receive() # Hoping it's not keyinit's all the way down ... # pylint: disable=C0301
+        def read(transaction):
+            """Read the snapshot in transaction."""
 
-            elif message["function"] == "version":
-                logger.info("Faking the version passed back ...")
+            entries = self.xs.ls(transaction, self._network_prefix) or []
+            networking = [ self.xs.read(transaction, self._network_prefix + "/" + entry) for entry in entries ] # pylint: disable=C0301
 
-                self.send(identifier, "0.0.1.36") # Apparently it's a protocol version ...
-                return self.receive()
+            hostname = None
+            if self.xs.ls(transaction, self._hostname_prefix) is not None:
+                hostname = self.xs.read(transaction, self._hostname_prefix)
 
-            elif message["function"] == "password":
-                if crypto.AES_KEYS is not None:
-                    logger.info("Decrypting password")
-                    message["password"] = crypto.decrypt(message["arguments"])
-                    logger.debug("Password: encrypted => %s; decrypted => %s", message["arguments"], message["password"]) # pylint: disable=C0301
-                    crypto.AES_KEYS = None
-                else:
-                    self._queue.put((path, message))
-                    return self.receive() # Potential for busy loop with itself if no keyinit ever comes ... # pylint: disable=C0301
+            return networking, hostname
 
-        logger.debug("Passing back identifier, %s, message, %s", identifier, message) # pylint: disable=C0301
+        return self._transaction(read)
 
-        return identifier, message
+    def _networking(self, macs):
+        """The entries in vm-data/networking once every MAC has one.
+
+        ### Description
+
+        Waits on a xenstore watch of the networking prefix (rather than
+        polling it) until the hypervisor has written an entry for each of the
+        passed MAC addresses or daemon.networking seconds have passed.  The
+        entries found are returned either way.
+
+        """
+
+        deadline = float(SingularityParameters()["daemon.networking"] or 0) or None # pylint: disable=C0301
+        expires = deadline and time.time() + deadline
+
+        changed = threading.Event()
+
+        def networking_watch(path):
+            logger.debug("Received a watch event on %s", path)
+            changed.set()
+            return True
+
+        watch = xswatch(self._network_prefix, networking_watch)
+
+        try:
+            while True:
+                # Cleared before reading so a change made after the read still
+                # wakes us up.
+                changed.clear()
+
+                transaction = self.xs.transaction_start()
+                entries = set(self.xs.ls(transaction, self._network_prefix) or []) # pylint: disable=C0301
+                self.xs.transaction_end(transaction)
+
+                logger.debug("Entries: %s", entries)
+
+                # MAC Addresses are upper in next gen but lower in first gen
+                # Why do things like this happen?
+
+                if not set([ entry.lower() for entry in entries ]) < set([ mac.lower() for mac in macs ]): # Required since we can't assume anything about the entries coming back ... pylint: disable=C0301
+                    return entries
+
+                if expires is not None and expires <= time.time():
+                    logger.warning("Networking entries, %s, missing MACs, %s, after %s seconds; continuing.", entries, macs, deadline) # pylint: disable=C0301
+                    return entries
+
+                # Waited in slices since a wait without a timeout can't be
+                # interrupted by the daemon's signals on Python 2.
+                while not changed.is_set():
+                    if expires is None:
+                        changed.wait(1)
+                    elif expires > time.time():
+                        changed.wait(min(1, expires - time.time()))
+                    else:
+                        break
+        finally:
+            watch.unwatch()
 
     def send(self, identifier, message, status = 0):
         """Send the passed message to the hypervisor.
@@ -395,38 +834,10 @@ class XenCommunicator(Communicator):
 
         """
 
-        # I'm getting used to lying to the hypervisor but this is ridiculous.
-        features = FeaturesConfigurator().content({})["message"]
+        features, replacement = self._features or self.features()
 
         if message == features:
-            message = []
-
-            feature_mapping = {
-                    "resetnetwork": set(["hosts", "network", "resolvers"]),
-                    "injectfile": set(["file"]),
-                    "agentupdate": set(["update"]),
-                    }
-
-            features = set(features.split(','))
-
-            for result, items in feature_mapping.iteritems():
-                if items & features:
-                    message.append(result)
-                    features -= items
-
-            message.extend(features)
-            message.append("keyinit") # Built-in to the communicator ...
-
-            # The following are required for instances to start on build ...
-            # Potentially restating items here in the event that other code
-            # specifying these actions is removed.
-            message.append("version")
-            message.append("features")
-            message.append("resetnetwork")
-            message.append("keyinit")
-            message.append("password")
-
-            message = ",".join(list(set(message)))
+            message = replacement
 
             logger.debug("Replaced features for xen: %s", message)
 
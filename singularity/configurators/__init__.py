@@ -11,12 +11,37 @@ import inspect
 import copy
 import itertools
 import importlib
+import hashlib
 
 from singularity.parameters import SingularityParameters
 
 logger = logging.getLogger("console") # pylint: disable=C0103
 
 class SingularityConfigurator(object):
+    # Message keys that must be present for this configurator to apply (see
+    # SingularityConfigurator.runnable for the available keys).
+    required_keys = frozenset()
+
+    # Values of the message's function key this configurator serves.  Empty
+    # places no restriction on the function.
+    required_functions = frozenset()
+
+    # Functions whose configurators must finish before this configurator is
+    # run for the same message (i.e. resolvers after network).
+    after = frozenset()
+
+    # Message keys content reads (when present) beyond required_keys.  They
+    # are fingerprinted along with required_keys (see idempotent) but don't
+    # affect dispatch.
+    fingerprint_keys = frozenset()
+
+    # True if applying the same required_keys and fingerprint_keys again
+    # changes nothing.  The daemon skips the function when these inputs match
+    # the last ones it applied successfully (during this boot) and all of the
+    # function's configurators are idempotent.  State that doesn't survive a
+    # reboot or link reset (i.e. set by running ip) isn't idempotent.
+    idempotent = False
+
     def __init__(self):
         """Initalize any common properties of SingularityConfigurators."""
         pass
@@ -79,6 +104,10 @@ class SingularityConfigurator(object):
         values it needs in the configuration dictionary it should alert
         Singularity that it is not runnable.
 
+        Keys and functions declared in required_keys and required_functions
+        are checked by SingularityConfigurators.dispatch before this method is
+        called and do not need to be checked again here.
+
         TODO Change tuples to dicts?
 
         [2]: Available keys in configuration:
@@ -161,19 +190,39 @@ class SingularityConfigurators(object): # pylint: disable=R0903
 
     """
 
-    def __init__(self):
+    def __init__(self, previous = None, manifest = None):
         """Initialize and find all Configurators in the configurator path(s).
 
+        ### Arguments
+
+        Argument | Description
+        -------- | -----------
+        previous | The SingularityConfigurators being reloaded (optional)
+        manifest | A manifest from a warm-start snapshot (optional)
+
         ### Description
 
         Populates this structure with the configurators found in the default
         path plus any other directories specified.  The extra directories are
         expected to come in via the CLI or the configuration file.
 
+        A manifest of the source (mtime, size and sha1) of every module found
+        is kept.  When previous is passed only the modules whose source changed
+        since previous was built are re-imported; the configurator instances
+        (and anything they've cached) of unchanged modules are reused.  The
+        names of the modules (re-)imported or removed are left in changed.
+
+        A manifest (i.e. from the daemon's warm-start snapshot) saves reading
+        and hashing the sources whose mtime and size it still matches.
+
         """
 
         self._configurators = {}
 
+        self.manifest = {} # Module name => source file's stat and sha1.
+        self.modules = {} # Module name => configurators instantiated from it.
+        self.changed = set()
+
         mydir = os.path.abspath(os.path.dirname(__file__)) # Module's Directory
         self.path = [
                 mydir,
@@ -212,22 +261,40 @@ class SingularityConfigurators(object): # pylint: disable=R0903
 
             logger.debug("Potential modules found: %s", module_names)
 
-            modules = []
-
             for module_name in module_names:
+                entry = _manifest_entry(directory, module_name, previous and previous.manifest.get(module_name) or (manifest or {}).get(module_name)) # pylint: disable=C0301
+
+                if previous is not None and module_name in previous.modules and entry is not None and entry["sha1"] == (previous.manifest.get(module_name) or {}).get("sha1"): # pylint: disable=C0301
+                    logger.debug("Module, %s, unchanged", module_name)
+                    self.manifest[module_name] = entry
+                    self.modules[module_name] = previous.modules[module_name]
+                    continue
+
                 try:
-                    modules.append(importlib.import_module(module_name))
+                    module = importlib.import_module(module_name)
+                    if previous is not None and module_name in previous.modules: # pylint: disable=C0301
+                        module = reload(module)
                     logger.info("Module, %s, imported", module_name)
                 except ImportError:
                     logger.warning("Module, %s, not able to be imported", module_name) # pylint: disable=C0301
                     continue
 
-            for module in modules:
+                self.manifest[module_name] = entry
+                self.changed.add(module_name)
+
                 logger.debug("Classes found in Module, %s: %s", module.__name__, inspect.getmembers(module, inspect.isclass)) # pylint: disable=C0301
 
-                for object_ in [ class_() for name, class_ in inspect.getmembers(module, inspect.isclass) if issubclass(class_, SingularityConfigurator) and class_ != SingularityConfigurator]: # pylint: disable=C0301,W0612
-                    logger.debug("Found appropriate object, %s", object_)
-                    self._configurators[object_.__class__.__name__] = object_
+                self.modules[module_name] = [ class_() for name, class_ in inspect.getmembers(module, inspect.isclass) if issubclass(class_, SingularityConfigurator) and class_ != SingularityConfigurator] # pylint: disable=C0301,W0612
+
+        if previous is not None:
+            self.changed.update(set(previous.modules.keys()) - set(self.modules.keys())) # pylint: disable=C0301
+
+        logger.info("Modules (re-)imported or removed: %s", self.changed)
+
+        for configurators in self.modules.itervalues():
+            for object_ in configurators:
+                logger.debug("Found appropriate object, %s", object_)
+                self._configurators[object_.__class__.__name__] = object_
 
         logger.debug("Type of self._configurators: %s", type(self._configurators)) # pylint: disable=C0301
 
@@ -235,6 +302,60 @@ class SingularityConfigurators(object): # pylint: disable=R0903
 
         logger.info("SingularityConfigurators found: %s", self._configurators) # pylint: disable=C0301
 
+        # Dispatch index of allowed function => configurators.  Built once per
+        # instance so the daemon doesn't re-parse main.functions and re-check
+        # every configurator for each message it receives.
+
+        self._index = {}
+
+        allowed = set([ func.strip() for func in SingularityParameters()["main.functions"].split(",") ]) # pylint: disable=C0301
+
+        for configurator in self._configurators:
+            if configurator.function not in allowed:
+                logger.info("Configurator, %s, is not allowed.", configurator) # pylint: disable=C0301
+                continue
+
+            self._index.setdefault(configurator.function, []).append(configurator) # pylint: disable=C0301
+
+        logger.debug("Dispatch index: %s", self._index)
+
+    @property
+    def functions(self):
+        """The allowed functions served by at least one configurator."""
+        return set(self._index.keys())
+
+    def dispatch(self, message):
+        """Configurators that may serve the passed message.
+
+        ### Arguments
+
+        Argument | Description
+        -------- | -----------
+        message  | The message received from the communicator (dict)
+
+        ### Description
+
+        If the function in the message is served directly by a configurator
+        (i.e. version, features, password) only those configurators are
+        returned.  Otherwise (i.e. resetnetwork) every allowed configurator is
+        returned and runnable decides which apply.
+
+        Configurators whose function is not allowed by main.functions or whose
+        required_keys and required_functions are not satisfied by the message
+        are never returned.  This rules out configurators before any of their
+        (potentially expensive) runnable probes are run.
+
+        """
+
+        keys = set(message.keys())
+        functions = set([ message.get("function") ])
+
+        configurators = itertools.chain(*self._index.values())
+        if message.get("function") in self._index:
+            configurators = self._index[message["function"]]
+
+        return [ configurator for configurator in configurators if not configurator.required_keys - keys and (not configurator.required_functions or configurator.required_functions & functions) ] # pylint: disable=C0301
+
     def __len__(self):
         return len(self._configurators)
 
@@ -253,3 +374,38 @@ class SingularityConfigurators(object): # pylint: disable=R0903
     def __contains__(self, item):
         return item in self._configurators
 
+
+def _manifest_entry(directory, module_name, previous = None):
+    """Manifest entry (mtime, size and sha1) of a module's source or None.
+
+    ### Description
+
+    The source is the module's .py file (or the package's __init__.py).  If
+    the mtime and size match the previous entry its sha1 is reused rather
+    than reading the file again.
+
+    """
+
+    source = os.path.join(directory, *module_name.split("."))
+
+    if os.path.isdir(source):
+        source = os.path.join(source, "__init__.py")
+    else:
+        source += ".py"
+
+    try:
+        stat = os.stat(source)
+    except OSError:
+        return None
+
+    if previous is not None and previous["mtime"] == stat.st_mtime and previous["size"] == stat.st_size: # pylint: disable=C0301
+        return previous
+
+    with open(source, "rb") as source_file:
+        sha1 = hashlib.sha1(source_file.read()).hexdigest() # pylint: disable=E1101,C0301
+
+    return {
+            "mtime": stat.st_mtime,
+            "size": stat.st_size,
+            "sha1": sha1,
+            }
@@ -11,7 +11,9 @@ from singularity.parameters import SingularityParameters
 logger = logging.getLogger("console") # pylint: disable=C0103
 
 class FeaturesConfigurator(SingularityConfigurator):
-    def runnable(self, configuration):
+    required_functions = frozenset([ "features" ])
+
+    def runnable(self, configuration): # pylint: disable=R0201,W0613
         """True if configurator can run on this system and in this context.
 
         ### Arguments
@@ -23,18 +25,10 @@ class FeaturesConfigurator(SingularityConfigurator):
         ### Description
 
         We should be able to run if the following conditions are true:
-        * Recieve a function of features
+        * Recieve a function of features (see required_functions)
 
         """
 
-        if "function" not in configuration:
-            logger.info("Must be passed a function in the message")
-            return False
-
-        if configuration["function"] != "features":
-            logger.info("Must be passed \"features\" as the function")
-            return False
-
         logger.info("FeaturesConfigurator is runnable!")
         return True
 
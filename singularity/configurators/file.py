@@ -11,7 +11,10 @@ from singularity.configurators import SingularityConfigurator
 logger = logging.getLogger(__name__) # pylint: disable=C0103
 
 class FileConfigurator(SingularityConfigurator):
-    def runnable(self, configuration):
+    required_keys = frozenset([ "arguments" ])
+    required_functions = frozenset([ "file" ])
+
+    def runnable(self, configuration): # pylint: disable=R0201,W0613
         """True if configurator can run on this system and in this context.
 
         ### Arguments
@@ -23,23 +26,11 @@ class FileConfigurator(SingularityConfigurator):
         ### Description
 
         We should be able to run if the following conditions are true:
-        * Recieve a function of file
-        * Receive an argument
+        * Recieve a function of file (see required_functions)
+        * Receive an argument (see required_keys)
 
         """
 
-        if "function" not in configuration:
-            logger.info("Must be passed a function in the message")
-            return False
-
-        if configuration["function"] != "file":
-            logger.info("Must be passed \"file\" as the function")
-            return False
-
-        if "arguments" not in configuration:
-            logger.info("Must be passed an argument in the message")
-            return False
-
         logger.info("FeaturesConfigurator is runnable!")
         return True
 
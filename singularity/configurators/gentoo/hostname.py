@@ -11,6 +11,9 @@ from singularity.configurators import SingularityConfigurator
 logger = logging.getLogger(__name__) # pylint: disable=C0103
 
 class GentooHostnameConfigurator(SingularityConfigurator):
+    required_keys = frozenset([ "hostname" ])
+    idempotent = True
+
     @property
     def function(self):
         return "hostname"
@@ -19,7 +22,7 @@ class GentooHostnameConfigurator(SingularityConfigurator):
     def confd_hostname_path(self): # pylint: disable=R0201,C0111
         return os.path.join(os.path.sep, "etc", "conf.d", "hostname")
 
-    def runnable(self, configuration):
+    def runnable(self, configuration): # pylint: disable=W0613
         """True if configurator can run on this system and in this context.
 
         ### Arguments
@@ -31,15 +34,12 @@ class GentooHostnameConfigurator(SingularityConfigurator):
         ### Description
 
         We should be able to run if the following conditions are true:
+        * Recieve a hostname (see required_keys)
         * On a Gentoo system
         * Has a writable /etc/conf.d/hostname file
 
         """
 
-        if "hostname" not in configuration:
-            logger.info("Must be passed a hostname in the message")
-            return False
-
         if not os.access(self.confd_hostname_path, os.W_OK):
             logger.info("Can't write to %s", self.confd_hostname_path)
             return False
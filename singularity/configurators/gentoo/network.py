@@ -5,13 +5,17 @@
 
 import logging
 import os
-import subprocess
 
+from singularity import helpers
 from singularity.configurators import SingularityConfigurator
 
 logger = logging.getLogger(__name__) # pylint: disable=C0103
 
 class GentooNetworkConfigurator(SingularityConfigurator):
+    required_keys = frozenset([ "ips" ])
+    fingerprint_keys = frozenset([ "routes" ])
+    idempotent = True
+
     @property
     def function(self):
         return "network"
@@ -20,7 +24,7 @@ class GentooNetworkConfigurator(SingularityConfigurator):
     def confd_net_path(self): # pylint: disable=R0201,C0111
         return os.path.join(os.path.sep, "etc", "conf.d", "net")
 
-    def runnable(self, configuration):
+    def runnable(self, configuration): # pylint: disable=W0613
         """True if configurator can run on this system and in this context.
 
         ### Arguments
@@ -32,25 +36,17 @@ class GentooNetworkConfigurator(SingularityConfigurator):
         ### Description
 
         We should be able to run if the following conditions are true:
+        * Recieve ips (see required_keys)
         * On a Gentoo system
         * Has a writable /etc/conf.d/net file
 
         """
 
-        if "ips" not in configuration:
-            logger.info("Must be passed ips in the message")
-            return False
-
         if not os.access(self.confd_net_path, os.W_OK):
             logger.info("Can't write to %s", self.confd_net_path)
             return False
 
-        self._rc_update_path = None # pylint: disable=W0201
-
-        try:
-            self._rc_update_path = subprocess.check_output("which rc-update", shell = True).strip() # pylint: disable=C0301
-        except subprocess.CalledProcessError:
-            pass
+        self._rc_update_path = helpers.which("rc-update") # pylint: disable=W0201,C0301
 
         logger.debug("rc-update path: %s", self._rc_update_path)
 
@@ -84,15 +80,14 @@ class GentooNetworkConfigurator(SingularityConfigurator):
 
         for interface, ips in configuration["ips"].iteritems():
 
+            # Relative link target without changing the working directory;
+            # other configurators may be running in this process.
             if not os.path.exists(os.path.join(init_path, "net." + interface)):
-                original_path = os.getcwd()
-                os.chdir(init_path)
-                os.symlink("net.lo", "net." + interface)
-                os.chdir(original_path)
+                os.symlink("net.lo", os.path.join(init_path, "net." + interface)) # pylint: disable=C0301
 
             logger.info("Calling: %s add net.%s default", self._rc_update_path, interface) # pylint: disable=C0301
             command = [ self._rc_update_path, "add", "net." + interface, "default" ] # pylint: disable=C0301
-            subprocess.check_call(command)
+            helpers.check_call(command)
 
             lines.append("config_{0}=\"".format(interface))
             for ip in ips: # pylint: disable=C0103
@@ -5,18 +5,20 @@
 
 import logging
 import os
-import subprocess
 
+from singularity import helpers
 from singularity.configurators import SingularityConfigurator
 
 logger = logging.getLogger(__name__) # pylint: disable=C0103
 
 class GentooUpdateConfigurator(SingularityConfigurator):
+    required_functions = frozenset([ "update" ])
+
     @property
     def function(self):
         return "update"
 
-    def runnable(self, configuration):
+    def runnable(self, configuration): # pylint: disable=W0613
         """True if configurator can run on this system and in this context.
 
         ### Arguments
@@ -28,29 +30,17 @@ class GentooUpdateConfigurator(SingularityConfigurator):
         ### Description
 
         We should be able to run if the following conditions are true:
+        * Recieve a function of update (see required_functions)
         * Running as root
         * Can find the emerge command
 
         """
 
-        if "function" not in configuration:
-            logger.info("Must be passed a function in the message")
-            return False
-
-        if configuration["function"] != "update":
-            logger.info("Must be passed \"update\" as the function")
-            return False
-
         if os.getuid() != 0:
             logger.info("This command must be run as uid 0!")
             return False
 
-        self._emerge_path = None # pylint: disable=W0201
-
-        try:
-            self._emerge_path = subprocess.check_output("which emerge", shell = True).strip() # pylint: disable=C0301,W0201,E1103
-        except subprocess.CalledProcessError:
-            pass
+        self._emerge_path = helpers.which("emerge") # pylint: disable=W0201
 
         logger.debug("emerge path: %s", self._emerge_path)
 
@@ -78,7 +68,7 @@ class GentooUpdateConfigurator(SingularityConfigurator):
 
         command = [ self._emerge_path, "-1", "app-emulation/singularity" ]
 
-        subprocess.check_call(command)
+        helpers.check_call(command)
 
         return { "": "" }
 
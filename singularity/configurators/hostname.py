@@ -5,8 +5,8 @@
 
 import logging
 import os
-import subprocess
 
+from singularity import helpers
 from singularity.configurators import SingularityConfigurator
 
 logger = logging.getLogger(__name__) # pylint: disable=C0103
@@ -14,7 +14,13 @@ logger = logging.getLogger(__name__) # pylint: disable=C0103
 class HostnameConfigurator(SingularityConfigurator):
     """Common configurator actions for hostname functionality."""
 
-    def runnable(self, configuration):
+    required_keys = frozenset([ "hostname" ])
+
+    # The hostname set with hostname is lost by a reboot while the inputs
+    # stay the same so it's always applied.
+    idempotent = False
+
+    def runnable(self, configuration): # pylint: disable=W0613
         """True if configurator can run on this system and in this context.
 
         ### Arguments
@@ -26,25 +32,17 @@ class HostnameConfigurator(SingularityConfigurator):
         ### Description
 
         We should be able to run if the following conditions are true:
+        * Recieve a hostname (see required_keys)
         * Running as root
         * Can find the hostname command
 
         """
 
-        if "hostname" not in configuration:
-            logger.info("Must be passed a hostname in the message")
-            return False
-
         if os.getuid() != 0:
             logger.info("This command must be run as uid 0!")
             return False
 
-        self._hostname_path = None # pylint: disable=W0201
-
-        try:
-            self._hostname_path = subprocess.check_output("which hostname", shell = True).strip() # pylint: disable=C0301,W0201,E1103
-        except subprocess.CalledProcessError:
-            pass
+        self._hostname_path = helpers.which("hostname") # pylint: disable=W0201
 
         logger.debug("hostname path: %s", self._hostname_path)
 
@@ -71,7 +69,7 @@ class HostnameConfigurator(SingularityConfigurator):
         """
 
         command = [ self._hostname_path, configuration["hostname"] ]
-        subprocess.check_call(command) # pylint: disable=C0301
+        helpers.check_call(command) # pylint: disable=C0301
 
         return { "": "" }
 
@@ -12,6 +12,9 @@ from singularity.configurators import SingularityConfigurator
 logger = logging.getLogger(__name__) # pylint: disable=C0103
 
 class HostsConfigurator(SingularityConfigurator):
+    required_keys = frozenset([ "hostname" ])
+    idempotent = True
+
     @property
     def hosts_path(self): # pylint: disable=R0201,C0111
         return os.path.join(os.path.sep, "etc", "hosts")
@@ -29,15 +32,11 @@ class HostsConfigurator(SingularityConfigurator):
 
         We should be able to run if the following conditions are true:
         * An /etc/hosts file is writable
-        * We recieved the hostname
+        * We recieved the hostname (see required_keys)
         * The hostname entries don't already exist
 
         """
 
-        if "hostname" not in configuration:
-            logger.info("Not passed a hostname")
-            return False
-
         if not os.access(self.hosts_path, os.W_OK):
             logger.info("Can't write to %s", self.hosts_path)
             return False
@@ -7,6 +7,7 @@ import logging
 import os
 import subprocess
 
+from singularity import helpers
 from singularity.configurators import SingularityConfigurator
 
 logger = logging.getLogger(__name__) # pylint: disable=C0103
@@ -14,7 +15,13 @@ logger = logging.getLogger(__name__) # pylint: disable=C0103
 class NetworkConfigurator(SingularityConfigurator):
     """Common configurator actions for network functionality."""
 
-    def runnable(self, configuration):
+    required_keys = frozenset([ "ips", "routes" ])
+
+    # Addresses and routes added with ip are lost by a reboot or link reset
+    # while the inputs stay the same so they're always applied.
+    idempotent = False
+
+    def runnable(self, configuration): # pylint: disable=W0613
         """True if configurator can run on this system and in this context.
 
         ### Arguments
@@ -26,29 +33,17 @@ class NetworkConfigurator(SingularityConfigurator):
         ### Description
 
         We should be able to run if the following conditions are true:
+        * Recieve ips and routes (see required_keys)
         * Running as root
         * Can find the ip command
 
         """
 
-        if "ips" not in configuration:
-            logger.info("Must be passed ips in the message")
-            return False
-
-        if "routes" not in configuration:
-            logger.info("Must be passed routes in the message")
-            return False
-
         if os.getuid() != 0:
             logger.info("This command must be run as uid 0!")
             return False
 
-        self._ip_path = None # pylint: disable=W0201
-
-        try:
-            self._ip_path = subprocess.check_output("which ip", shell = True).strip() # pylint: disable=C0301,W0201,E1103
-        except subprocess.CalledProcessError:
-            pass
+        self._ip_path = helpers.which("ip") # pylint: disable=W0201
 
         logger.debug("ip path: %s", self._ip_path)
 
@@ -79,7 +74,7 @@ class NetworkConfigurator(SingularityConfigurator):
                 logger.info("Calling: %s addr add %s dev %s", self._ip_path, ip[0], interface) # pylint: disable=C0301
                 command = [ self._ip_path, "address", "add", ip[0], "dev", interface ] # pylint: disable=C0301
                 try:
-                    subprocess.check_call(command)
+                    helpers.check_call(command)
                 except subprocess.CalledProcessError as error:
                     if error.returncode != 2: # TODO Verify this exit code means already present. # pylint: disable=C0301
                         raise
@@ -89,7 +84,7 @@ class NetworkConfigurator(SingularityConfigurator):
                 logger.info("Calling: %s route add to %s via %s dev %s", self._ip_path, route[0], route[1], interface) # pylint: disable=C0301
                 command = [ self._ip_path, "route", "add", "to", route[0], "via", route[1], "dev", interface ] # pylint: disable=C0301
                 try:
-                    subprocess.check_call(command)
+                    helpers.check_call(command)
                 except subprocess.CalledProcessError as error:
                     if error.returncode != 2: # TODO Verify this exit code means already present. # pylint: disable=C0301
                         raise
@@ -5,15 +5,17 @@
 
 import logging
 import os
-import subprocess
 import tempfile
 
+from singularity import helpers
 from singularity.configurators import SingularityConfigurator
 
 logger = logging.getLogger(__name__) # pylint: disable=C0103
 
 class PasswordConfigurator(SingularityConfigurator):
-    def runnable(self, configuration):
+    required_keys = frozenset([ "password" ])
+
+    def runnable(self, configuration): # pylint: disable=W0613
         """True if configurator can run on this system and in this context.
 
         ### Arguments
@@ -25,25 +27,17 @@ class PasswordConfigurator(SingularityConfigurator):
         ### Description
 
         We should be able to run if the following conditions are true:
+        * Recieve a password (see required_keys)
         * Running as root
         * Can find the passwd command
 
         """
 
-        if "password" not in configuration:
-            logger.info("Must be passed a password in the message")
-            return False
-
         if os.getuid() != 0:
             logger.info("This command must be run as uid 0!")
             return False
 
-        self._chpasswd_path = None # pylint: disable=W0201
-
-        try:
-            self._chpasswd_path = subprocess.check_output("which chpasswd", shell = True).strip() # pylint: disable=C0301,W0201,E1103
-        except subprocess.CalledProcessError:
-            pass
+        self._chpasswd_path = helpers.which("chpasswd") # pylint: disable=W0201
 
         logger.debug("chpasswd path: %s", self._chpasswd_path)
 
@@ -78,7 +72,7 @@ class PasswordConfigurator(SingularityConfigurator):
 
         command = [ self._chpasswd_path ] 
 
-        subprocess.check_call(command, stdin = password)
+        helpers.check_call(command, stdin = password)
 
         return { "": "" }
 
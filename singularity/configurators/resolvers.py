@@ -12,6 +12,11 @@ from singularity.configurators import SingularityConfigurator
 logger = logging.getLogger(__name__) # pylint: disable=C0103
 
 class ResolversConfigurator(SingularityConfigurator):
+    required_keys = frozenset([ "resolvers" ])
+    fingerprint_keys = frozenset([ "hostname" ]) # The search domain.
+    after = frozenset([ "network" ])
+    idempotent = True
+
     @property
     def resolvconf_path(self): # pylint: disable=R0201,C0111
         return os.path.join(os.path.sep, "etc", "resolv.conf")
@@ -29,15 +34,11 @@ class ResolversConfigurator(SingularityConfigurator):
 
         We should be able to run if the following conditions are true:
         * An /etc/resolv.conf file is writable
-        * We recieved the resolvers
+        * We recieved the resolvers (see required_keys)
         * The resolver entries don't already exist
 
         """
 
-        if "resolvers" not in configuration:
-            logger.info("Must be passed resolver information in the message")
-            return False
-
         if not os.access(self.resolvconf_path, os.W_OK):
             logger.info("Must be able to write %s", self.resolvconf_path)
             return False
@@ -12,7 +12,9 @@ from singularity.configurators import SingularityConfigurator
 logger = logging.getLogger(__name__) # pylint: disable=C0103
 
 class VersionConfigurator(SingularityConfigurator):
-    def runnable(self, configuration):
+    required_functions = frozenset([ "version" ])
+
+    def runnable(self, configuration): # pylint: disable=R0201,W0613
         """True if configurator can run on this system and in this context.
 
         ### Arguments
@@ -24,18 +26,10 @@ class VersionConfigurator(SingularityConfigurator):
         ### Description
 
         We should be able to run if the following conditions are true:
-        * Recieve a function of version
+        * Recieve a function of version (see required_functions)
 
         """
 
-        if "function" not in configuration:
-            logger.info("Must be passed a function in the message")
-            return False
-
-        if configuration["function"] != "version":
-            logger.info("Must be passed \"version\" as the function")
-            return False
-
         logger.info("VersionConfigurator is runnable!")
         return True
 
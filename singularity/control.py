@@ -0,0 +1,97 @@
+# Copyright (C) 2012 by Alex Brandt <alunduil@alunduil.com>
+#
+# singularity is freely distributable under the terms of an MIT-style license.
+# See COPYING or http://www.opensource.org/licenses/mit-license.php.
+
+import logging
+import json
+import os
+import socket
+import threading
+
+from singularity.statistics import SingularityStatistics
+
+logger = logging.getLogger("console") # pylint: disable=C0103
+
+# Seconds a client may take to send its command before it's disconnected (so
+# a client that never sends can't block the other clients).
+CLIENT_TIMEOUT = 5
+
+class SingularityControl(object):
+    """Local control socket answering queries about the running daemon.
+
+    ### Description
+
+    Listens on a unix socket (only accessible to the daemon's user) in the
+    daemon's run directory.  A client writes a command on a line and reads
+    back a JSON response before the connection is closed.
+
+    Command | Response
+    ------- | --------
+    status  | SingularityStatistics().snapshot()
+
+    ### Examples
+
+    >>> control = SingularityControl("/var/run/singularity/control.sock")
+    >>> query("/var/run/singularity/control.sock")
+    {u'counters': {...}, u'gauges': {...}, u'timings': {...}}
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+        # Created without access for anyone else rather than chmod'ed after.
+        umask = os.umask(0o077)
+        try:
+            self.socket.bind(self.path)
+        finally:
+            os.umask(umask)
+
+        os.chmod(self.path, 0o600)
+        self.socket.listen(1)
+
+        self.thread = threading.Thread(target = self._serve, name = "control")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _serve(self):
+        """Answer queries forever."""
+
+        while True:
+            connection, address = self.socket.accept() # pylint: disable=W0612
+
+            try:
+                connection.settimeout(CLIENT_TIMEOUT)
+
+                command = connection.makefile("r").readline().strip()
+
+                logger.debug("Control command: %s", command)
+
+                if command == "status":
+                    response = SingularityStatistics().snapshot()
+                else:
+                    response = { "error": "Unknown command, {0}".format(command) } # pylint: disable=C0301
+
+                connection.sendall(json.dumps(response) + "\n")
+            except Exception as error: # pylint: disable=W0703
+                logger.exception(error)
+            finally:
+                connection.close()
+
+def query(path, command = "status"):
+    """Send command to the control socket at path and return the response."""
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        client.connect(path)
+        client.sendall(command + "\n")
+        return json.loads(client.makefile("r").readline())
+    finally:
+        client.close()
@@ -11,19 +11,59 @@ import signal
 import pwd
 import grp
 import os
+import errno
 import fcntl
+import json
+import subprocess
 import sys
+import threading
 import time
+import uuid
 
+import singularity.activation as activation
 import singularity.communicators as communicators
+import singularity.handoff as handoff
+import singularity.jobs as jobs
+import singularity.snapshot as snapshot
 
 from singularity.parameters import SingularityParameters
 from singularity.configurators import SingularityConfigurators
 from singularity.applicator import SingularityApplicator
 from singularity.cache import SingularityCache
+from singularity.executor import SingularityExecutor
+from singularity.executor import SingularityPool
+from singularity.scheduler import SingularityScheduler
+from singularity.fingerprints import SingularityFingerprints
+from singularity.fingerprints import fingerprint
+from singularity.responses import SingularityResponses
+from singularity.responses import response_key
+from singularity.jobs import SingularityJobs
+from singularity.journal import SingularityJournal
+from singularity.monitor import SingularityFdMonitor
+from singularity.monitor import descriptors
+from singularity.monitor import subprocesses
+from singularity.control import SingularityControl
+from singularity.control import query
+from singularity.statistics import SingularityStatistics
+from singularity.watcher import SingularityWatcher
 
 logger = logging.getLogger("console") # pylint: disable=C0103
 
+# Functions whose newest message supersedes any earlier ones (the hypervisor
+# sends the complete networking and hostname state with each resetnetwork).
+COALESCED_FUNCTIONS = [ "resetnetwork" ]
+
+# Seconds between checks that the work left to a daemon handing off is done.
+HANDOFF_INTERVAL = 0.1
+
+# Seconds restart gives a successor to take the pidfile over once the daemon
+# it replaced has released it.
+TAKEOVER_TIMEOUT = 5
+
+# Command line of this process (the daemon changes directory when started) to
+# start a successor with.
+ARGV = [ os.path.abspath(sys.argv[0]) ] + sys.argv[1:]
+
 class SingularityDaemon(object):
     def __call__(self):
         actions = {
@@ -58,7 +98,12 @@ class SingularityDaemon(object):
         if not os.path.exists(SingularityParameters()["daemon.run"]):
             os.makedirs(SingularityParameters()["daemon.run"])
 
-        context.pidfile = PidFile(SingularityParameters()["daemon.pidfile"])
+        # State handed off by a daemon being restarted (see hand_off).  The
+        # predecessor holds the pidfile until its in-flight work is done; we
+        # serve in the meantime and take the pidfile over once it's released.
+        state = handoff.load()
+
+        context.pidfile = PidFile(SingularityParameters()["daemon.pidfile"], background = bool(state)) # pylint: disable=C0301
         context.umask = 0o002
         context.uid = pwd.getpwnam(SingularityParameters()["daemon.uid"]).pw_uid
         context.gid = grp.getgrnam(SingularityParameters()["daemon.gid"]).gr_gid
@@ -68,84 +113,552 @@ class SingularityDaemon(object):
         context.files_preserve = []
         context.files_preserve.extend([ handler.stream for handler in logging.getLogger().handlers if hasattr(handler, "stream") ]) # pylint: disable=C0301
         context.files_preserve.extend([ handler.socket for handler in logging.getLogger().handlers if hasattr(handler, "socket") ]) # pylint: disable=C0301
+        context.files_preserve.extend(state.get("descriptors", []))
+        context.files_preserve.extend(activation.listen())
 
         logger.debug("Preserved files: %s", context.files_preserve)
-        logger.debug("Open files: %s", [ os.path.realpath(os.path.join(os.path.sep, "proc", "self", "fd", fd)) for fd in os.listdir(os.path.join(os.path.sep, "proc", "self", "fd")) ]) # pylint: disable=C0301
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Open files: %s", descriptors().values())
 
         def term_handler(signum, frame): # pylint: disable=W0613
             """TERM and INT shut down the daemon."""
             logger.info("Shutting down.")
+
+            if hasattr(self, "_configurators"):
+                try:
+                    snapshot.save(self._configurators)
+                except (IOError, OSError) as error:
+                    logger.warning("Unable to write the warm-start snapshot: %s", error) # pylint: disable=C0301
+
             context.close()
             logging.shutdown()
             sys.exit(0)
 
+        def wake():
+            """Wake the main loop if it's waiting on the communicator.
+
+            ### Description
+
+            The communicator is woken from a thread as this may be called from
+            a signal handler whose interrupted main thread holds its locks.
+
+            """
+
+            if hasattr(self, "_communicator"):
+                thread = threading.Thread(target = self._communicator.wake, name = "wake") # pylint: disable=C0301
+                thread.daemon = True
+                thread.start()
+
         def hup_handler(signum, frame): # pylint: disable=W0613
-            """HUP signal reloads the configuration and configurators."""
+            """HUP asks the main loop to reload (see reload).
+
+            ### Description
+
+            Only a flag is set here; the main loop reloads between messages so
+            nothing (i.e. the worker processes) is forked from a signal handler
+            and a reload during startup waits until everything it replaces has
+            been built.
+
+            """
+
+            logger.info("Reload requested.")
+
+            self._reloading = True
+
+            wake()
+
+        def reload():
+            """Reload the configuration and any changed configurators."""
+            logger.info("Reloading.")
+
+            processes = SingularityParameters()["daemon.processes"]
+
             SingularityParameters().reinit()
-            self._configurators = SingularityConfigurators()
+            self._configurators = SingularityConfigurators(self._configurators)
+            self._communicator.reload()
+
+            # Workers hold their own configurators; only replace them if those
+            # are stale or the number of workers changed.  The old workers are
+            # terminated once the runs still using them have finished.
+            if len(self._configurators.changed) or processes != SingularityParameters()["daemon.processes"]: # pylint: disable=C0301
+                if self._pool is not None:
+                    self._pool.retire()
+                self._pool = pool(wake)
+
+            self._executor = SingularityExecutor(SingularityParameters()["daemon.workers"], self._pool) # pylint: disable=C0301
+            self._scheduler.fast = set([ func.strip() for func in SingularityParameters()["daemon.fast"].split(",") ]) # pylint: disable=C0301
+            self._scheduler.window = float(SingularityParameters()["daemon.coalesce"] or 0) # pylint: disable=C0301
+            self._deadlines = deadlines()
+            self._jobs.functions = set([ func.strip() for func in SingularityParameters()["daemon.background"].split(",") ]) # pylint: disable=C0301
+            self._monitor.interval = float(SingularityParameters()["daemon.fdinterval"] or 0) # pylint: disable=C0301
+            self._monitor.threshold = int(SingularityParameters()["daemon.fdthreshold"] or 0) # pylint: disable=C0301
+            self._monitor.start()
+            self._watcher.directories = watched(self._configurators)
+            self._watcher.debounce = float(SingularityParameters()["daemon.watch"] or 0) # pylint: disable=C0301
+            self._watcher.start()
+
+        def handoff_handler(signum, frame): # pylint: disable=W0613
+            """USR1 asks the main loop to hand the daemon over (see hand_off).
+
+            ### Description
+
+            Only a flag is set here; the main loop hands off between messages
+            so a message already taken from the communicator is never lost.
+
+            """
+
+            signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+
+            logger.info("Handoff requested.")
+
+            self._handing_off = True
+
+            wake()
+
+        def hand_off():
+            """Hand the daemon over to a freshly started successor.
+
+            ### Description
+
+            Messages not yet being handled, the communicator's state (i.e. the
+            listening socket) and queued jobs are written to a handoff file
+            and a successor is started with it.  Once the successor reports
+            it's ready (see handoff.notify) it serves new messages while this
+            daemon finishes the work in flight and exits, releasing the
+            pidfile to the successor (see PidFile).
+
+            Messages carrying a plaintext password are answered with an error
+            instead of being written to the handoff file.
+
+            If the successor can't be started or doesn't report ready (within
+            daemon.timeout seconds) everything handed off is taken back (see
+            Communicator.takeback) and this daemon carries on.  Returns True
+            if the successor is serving.
+
+            """
+
+            logger.info("Handing off to a successor.")
+
+            messages = []
+
+            for identifier, message in self._scheduler.drain():
+                self._keys.pop(identifier, None)
+
+                if "password" in message:
+                    self._communicator.send(identifier, "Agent restarting; please retry", 1) # pylint: disable=C0301
+                    self._journal.finish(self._entries.pop(identifier, None)) # pylint: disable=C0301
+                    continue
+
+                messages.append((identifier, message))
+
+            communicator, descriptors = self._communicator.handoff([ identifier for identifier, message in messages ]) # pylint: disable=C0301
+
+            queued = self._jobs.drain()
+
+            entries = dict([ (identifier, self._entries.pop(identifier, None)) for identifier, message in messages + queued ]) # pylint: disable=C0301
+
+            path = None
+            started = {}
+
+            # The successor reports its startup on the write end (see
+            # handoff.wait); only it may hold a copy so its exit is seen.
+            ready = os.pipe()
+
+            flags = fcntl.fcntl(ready[0], fcntl.F_GETFD)
+            fcntl.fcntl(ready[0], fcntl.F_SETFD, flags | fcntl.FD_CLOEXEC)
+
+            try:
+                try:
+                    path = handoff.save({
+                        "communicator": communicator,
+                        "descriptors": descriptors + [ ready[1] ],
+                        "messages": messages,
+                        "jobs": queued,
+                        "entries": entries,
+                        "ready": ready[1],
+                        })
+
+                    environment = dict(os.environ)
+                    environment[handoff.ENVIRONMENT] = path
+
+                    logger.info("Starting successor: %s", successor())
+                    subprocess.Popen(successor(), env = environment, close_fds = False) # pylint: disable=C0301
+                finally:
+                    os.close(ready[1])
+
+                started = handoff.wait(ready[0], float(SingularityParameters()["daemon.timeout"] or 0) or None) # pylint: disable=C0301
+            except (IOError, OSError) as error:
+                logger.error("Unable to start a successor: %s", error)
+            finally:
+                os.close(ready[0])
+
+            if started.get("READY") != "1":
+                logger.error("The successor isn't serving; carrying on.")
+
+                if "MAINPID" in started: # Still starting; it mustn't serve.
+                    try:
+                        os.kill(int(started["MAINPID"]), signal.SIGKILL)
+                    except OSError as error:
+                        if error.errno != errno.ESRCH:
+                            raise
+
+                if path is not None and os.path.exists(path):
+                    os.remove(path)
+
+                self._communicator.takeback(communicator)
+
+                self._entries.update(dict([ (identifier, entry) for identifier, entry in entries.iteritems() if entry is not None ])) # pylint: disable=C0301
+
+                for identifier, message in messages:
+                    self._keys[identifier] = response_key(identifier, message)
+                    self._scheduler.submit(identifier, message)
+
+                for job_id, message in queued:
+                    self._jobs.submit(message, job_id)
+
+                signal.signal(signal.SIGUSR1, handoff_handler)
+
+                return False
+
+            logger.info("The successor, %s, is serving.", started.get("MAINPID")) # pylint: disable=C0301
+
+            # The successor appends to the journal from now on.
+            self._journal.exclusive = lambda: False
+
+            return True
 
         context.signal_map = {
                 signal.SIGTERM: term_handler,
                 signal.SIGINT: term_handler,
                 signal.SIGHUP: hup_handler,
+                signal.SIGUSR1: handoff_handler,
                 }
 
+        # Set by handoff_handler; acted on by the main loop.
+        self._handing_off = False # pylint: disable=W0201
+
+        # Set by hup_handler; acted on by the main loop.
+        self._reloading = False # pylint: disable=W0201
+
         logger.info("Starting up.")
         with context:
+            # Lets a predecessor kill us if we don't report ready in time.
+            handoff.notify(state, "MAINPID={0}".format(os.getpid()))
 
-            self._configurators = SingularityConfigurators() # pylint: disable=W0201,C0301
-            self._communicator = communicators.create() # pylint: disable=W0201
+            # Seeds the tool and interface caches (shared with the workers).
+            warm = snapshot.load()
+
+            # Fork the workers before any threads are started or the
+            # communicator is set up so they start from a small process.
+            self._pool = pool(wake) # pylint: disable=W0201
+
+            self._configurators = SingularityConfigurators(manifest = warm.get("manifest")) # pylint: disable=W0201,C0301
+            # A predecessor handing off appends to the journal until it exits
+            # and releases the pidfile to us.
+            self._journal = SingularityJournal(resume = not state, exclusive = lambda: context.pidfile.locked) # pylint: disable=W0201,C0301
+
+            self._communicator = communicators.create(handoff = state.get("communicator"), journal = self._journal) # pylint: disable=W0201,C0301
+            self._executor = SingularityExecutor(SingularityParameters()["daemon.workers"], self._pool) # pylint: disable=W0201,C0301
+            self._fingerprints = SingularityFingerprints() # pylint: disable=W0201,C0301
+            self._responses = SingularityResponses(SingularityParameters()["daemon.responses"]) # pylint: disable=W0201,C0301
+            self._keys = {} # pylint: disable=W0201
+            self._deadlines = deadlines() # pylint: disable=W0201
+            self._entries = dict(state.get("entries", {})) # pylint: disable=W0201,C0301
+            self._jobs = SingularityJobs(self.apply, [ func.strip() for func in SingularityParameters()["daemon.background"].split(",") ], done = self.job_done) # pylint: disable=W0201,C0301
+            self._scheduler = SingularityScheduler(self.handle, [ func.strip() for func in SingularityParameters()["daemon.fast"].split(",") ], COALESCED_FUNCTIONS, SingularityParameters()["daemon.coalesce"], self.deadline, self.expired) # pylint: disable=W0201,C0301
+            self._monitor = SingularityFdMonitor(SingularityParameters()["daemon.fdinterval"], SingularityParameters()["daemon.fdthreshold"]) # pylint: disable=W0201,C0301
+
+            # Changes found by the watcher are reloaded by the HUP handler in
+            # the main thread just as if someone had sent a SIGHUP.
+            self._watcher = SingularityWatcher(watched(self._configurators), lambda: os.kill(os.getpid(), signal.SIGHUP), SingularityParameters()["daemon.watch"]) # pylint: disable=W0201,C0301
+
+            SingularityStatistics().gauge("queues", lambda: dict(self._scheduler.depths.items() + [ ("jobs", self._jobs.depth) ])) # pylint: disable=C0301
+            SingularityStatistics().gauge("subprocesses", subprocesses)
+
+            self._control = SingularityControl(control_path()) # pylint: disable=W0201,C0301
+
+            self.resume()
+
+            # Configurators are loaded and the communicator is listening.
+            activation.notify("READY=1", "MAINPID={0}".format(os.getpid()))
+            handoff.notify(state, "READY=1")
+
+            for identifier, message in state.get("messages", []):
+                self._keys[identifier] = response_key(identifier, message)
+                self._scheduler.submit(identifier, message)
+
+            for job_id, message in state.get("jobs", []):
+                self._jobs.submit(message, job_id)
 
             while True:
-                logger.debug("Open files: %s", [ os.path.realpath(os.path.join(os.path.sep, "proc", "self", "fd", fd)) for fd in os.listdir(os.path.join(os.path.sep, "proc", "self", "fd")) ]) # pylint: disable=C0301
+                if self._handing_off:
+                    self._handing_off = False
+
+                    if hand_off():
+                        break
+
+                if self._reloading:
+                    self._reloading = False
+                    reload()
+
+                # A stuck worker was found (see SingularityPool.replace).
+                if self._pool is not None and self._pool.stale:
+                    self._pool.renew()
 
                 identifier, message = self._communicator.receive()
+
+                if identifier is None: # Woken; see Communicator.wake.
+                    continue
+
                 logger.info("Got message, %s, with identifier, %s", message, identifier) # pylint: disable=C0301
 
-                functions = set()
-                response = ""
+                # Journalled by the communicator (see Communicator.entry).
+                entry = self._communicator.entry(identifier)
+
+                if message.get("function") == jobs.STATUS:
+                    self.job_status(identifier, message)
+                    self._journal.finish(entry)
+                    continue
+
+                key = response_key(identifier, message)
+
+                if key in self._responses:
+                    logger.info("Replaying the response to message, %s", identifier) # pylint: disable=C0301
+                    self._communicator.send(identifier, *self._responses[key])
+                    self._journal.finish(entry)
+                    continue
+
+                if message.get("function") in self._jobs.functions:
+                    job_id = uuid.uuid4().hex
+                    self._entries[job_id] = self._journal.accept(identifier, message, job_id) # pylint: disable=C0301
+                    self._journal.finish(entry)
+                    self._jobs.submit(message, job_id)
+                    logger.info("Acknowledging message, %s, as job, %s", identifier, job_id) # pylint: disable=C0301
+                    self._communicator.send(identifier, job_id)
+                    self._responses[key] = (job_id, 0)
+                    continue
+
+                self._keys[identifier] = key
+                self._entries[identifier] = entry or self._journal.accept(identifier, message) # pylint: disable=C0301
+
+                self._scheduler.submit(identifier, message)
+
+            # Handed off; the successor is already serving.
+            while not self._scheduler.idle or not self._jobs.idle:
+                time.sleep(HANDOFF_INTERVAL)
+
+            if self._pool is not None:
+                self._pool.terminate()
+
+            term_handler(signal.SIGUSR1, None)
+
+    def handle(self, identifiers, message):
+        """Run the configurators for a message and respond to it.
+
+        ### Arguments
+
+        Argument    | Description
+        --------    | -----------
+        identifiers | The identifiers of the messages to respond to.
+        message     | The message received from the communicator (dict)
+
+        ### Description
+
+        Called from the scheduler's lanes.  Runs the configurators that serve
+        the message, caches and applies their content, and sends the response
+        back through the communicator.  If a configurator fails the error is
+        sent back as the response with a non-zero status instead of stopping
+        the daemon.
+
+        More than one identifier is passed when the scheduler coalesced a burst
+        of messages; every identifier receives the same response.
+
+        Successful responses are stored in SingularityResponses so a replay of
+        the same message is answered without running this again.
+
+        Messages the scheduler's watchdog gave up on (see expired) were already
+        answered and aren't answered again if this does finish (see
+        SingularityScheduler.claim).
+
+        """
+
+        try:
+            response = self.apply(message)
+        except Exception as error: # pylint: disable=W0703
+            logger.exception(error)
+            for identifier in self._scheduler.claim(identifiers):
+                self._communicator.send(identifier, str(error), 1)
+                self._keys.pop(identifier, None)
+                self._journal.finish(self._entries.pop(identifier, None))
+            return
+
+        for identifier in self._scheduler.claim(identifiers):
+            self._communicator.send(identifier, response)
+            self._responses[self._keys.pop(identifier, None)] = (response, 0)
+            self._journal.finish(self._entries.pop(identifier, None))
+
+    def resume(self):
+        """Resume or answer the messages a previous daemon left unfinished.
+
+        ### Description
+
+        Entries in the journal (see SingularityJournal) that were never
+        finished are handled before any new message is received (raw entries
+        are received again through the communicator).  Entries
+        whose response was already sent (the daemon died before journalling
+        the completion) are answered from the response cache.  Entries whose
+        message carried a password weren't journalled with it and are answered
+        with an error so the hypervisor can retry.
+
+        """
+
+        for record in self._journal.unfinished:
+            identifier, message, job_id = record["identifier"], record["message"], record["job"] # pylint: disable=C0301
+
+            logger.info("Resuming message, %s, from the journal", identifier)
+
+            if message is None:
+                self._communicator.send(identifier, "Agent restarted; please retry", 1) # pylint: disable=C0301
+                self._journal.finish(record["entry"])
+                continue
+
+            if record.get("raw"): # Queued again by the communicator.
+                continue
+
+            if job_id is not None:
+                self._entries[job_id] = record["entry"]
+                self._jobs.submit(message, job_id)
+                continue
+
+            key = response_key(identifier, message)
+
+            if key in self._responses:
+                self._communicator.send(identifier, *self._responses[key])
+                self._journal.finish(record["entry"])
+                continue
+
+            self._keys[identifier] = key
+            self._entries[identifier] = record["entry"]
+            self._scheduler.submit(identifier, message)
+
+    def job_done(self, job_id):
+        """Journal the completion of a background job."""
+        self._journal.finish(self._entries.pop(job_id, None))
+
+    def apply(self, message, progress = None):
+        """Run the configurators for a message and return the response.
+
+        ### Arguments
+
+        Argument | Description
+        -------- | -----------
+        message  | The message received from the communicator (dict)
+        progress | Callable taking a description of the progress made
+
+        ### Description
+
+        Runs the configurators that serve the message within the message's
+        deadline, caches and applies their content, and returns the messages
+        they produced.  Errors are raised to the caller (the scheduler's lanes
+        or the background jobs).
+
+        Functions whose idempotent configurators would receive the same inputs
+        they last applied successfully (see SingularityFingerprints) are
+        skipped entirely.
+
+        """
+
+        started = time.time()
+
+        try:
+            return self._apply(message, progress)
+        finally:
+            SingularityStatistics().increment("messages." + str(message.get("function"))) # pylint: disable=C0301
+            SingularityStatistics().time("latency", time.time() - started)
 
-                # TODO Add proper error handling here ...
+    def _apply(self, message, progress = None):
+        """Body of apply (which records its statistics)."""
 
-                logger.debug("Length of configurators: %s", len(self._configurators)) # pylint: disable=C0301
+        functions = set()
+        response = ""
 
-                for configurator in self._configurators:
-                    if configurator.function not in [ func.strip() for func in SingularityParameters()["main.functions"].split(",") ]: # pylint: disable=C0301
-                        logger.info("Configurator, %s, is not allowed.", configurator) # pylint: disable=C0301
-                        continue
+        configurators = self._configurators.dispatch(message)
 
-                    if not configurator.runnable(message):
-                        logger.info("Configurator, %s, is not runnable.", configurator) # pylint: disable=C0301
-                        continue
+        fingerprints = fingerprint(configurators, message)
 
-                    logger.info("Found configurator, %s, with function, %s", configurator, configurator.function) # pylint: disable=C0301
-                    functions.add(configurator.function)
+        unchanged = self._fingerprints.unchanged(fingerprints)
+        if len(unchanged):
+            logger.info("Skipping functions, %s, already applied with these inputs.", unchanged) # pylint: disable=C0301
+            configurators = [ configurator for configurator in configurators if configurator.function not in unchanged ] # pylint: disable=C0301
 
-                    for filename, content in configurator.content(message).iteritems(): # pylint: disable=C0301
-                        if "message" == filename:
-                            response += content + "\n"
-                        elif filename.startswith("/"):
-                            SingularityCache()[configurator.function + "." + filename] = content # pylint: disable=C0301
+        logger.debug("Length of configurators: %s", len(configurators))
 
-                logger.info("Applying the functions found ...")
-                logger.debug("Functions found: %s", functions)
-                SingularityApplicator()(actions = functions)
+        def finished(configurator, count, total):
+            """Report each finished configurator as progress."""
+            progress("{0} of {1} configurators finished (last: {2})".format(count, total, configurator.__class__.__name__)) # pylint: disable=C0301
 
-                response = "" + "\n" + response
+        for configurator, contents in self._executor(configurators, message, self.deadline(message), progress and finished): # pylint: disable=C0301
+            functions.add(configurator.function)
+
+            for filename, content in contents.iteritems():
+                if "message" == filename:
+                    response += content + "\n"
+                elif filename.startswith("/"):
+                    SingularityCache()[configurator.function + "." + filename] = content # pylint: disable=C0301
+
+        logger.info("Applying the functions found ...")
+        logger.debug("Functions found: %s", functions)
+        SingularityApplicator()(actions = functions)
+
+        self._fingerprints.update(dict([ (function, value) for function, value in fingerprints.iteritems() if function in functions ])) # pylint: disable=C0301
+
+        response = "" + "\n" + response
+
+        return response.strip()
+
+    def job_status(self, identifier, message):
+        """Answer a status query for a background job.
+
+        ### Description
+
+        The message's arguments hold the job id returned when the job was
+        acknowledged.  The response is the job's record as JSON (see
+        SingularityJobs).
+
+        """
+
+        job_id = message.get("arguments")
+
+        if job_id not in self._jobs:
+            self._communicator.send(identifier, "Unknown job, {0}".format(job_id), 1) # pylint: disable=C0301
+            return
+
+        self._communicator.send(identifier, json.dumps(self._jobs[job_id]))
+
+    def deadline(self, message):
+        """Seconds the daemon may spend handling the passed message."""
+        return self._deadlines.get(message.get("function"), self._deadlines.get("default")) # pylint: disable=C0301
+
+    def expired(self, identifiers, message):
+        """Answer messages the scheduler's watchdog gave up on."""
+        for identifier in identifiers:
+            self._communicator.send(identifier, "Deadline of {0} seconds exceeded handling {1}".format(self.deadline(message), message.get("function")), 1) # pylint: disable=C0301
+            self._keys.pop(identifier, None)
+            self._journal.finish(self._entries.pop(identifier, None))
 
-                self._communicator.send(identifier, response.strip())
-           
     def stop(self):
         """Stop any running daemons.
         
         ### Description
 
-        Sends a SIGTERM to any daemon that is currently running.
+        Sends a SIGTERM to any daemon that is currently running and waits (up
+        to daemon.timeout seconds) for it to release its pidfile.
         
         """
         if self.running:
             logger.info("Sending daemon, %s, SIGTERM.", self.daemon_pid)
             os.kill(self.daemon_pid, signal.SIGTERM)
+            self.wait()
         else:
             logger.warning("Daemon not running.")
             print("Singularity is not running ...", file = sys.stderr)
@@ -168,25 +681,89 @@ class SingularityDaemon(object):
             self.start()
 
     def restart(self):
-        """Stop and start the daemon.
+        """Hand the daemon over to a new daemon.
 
         ### Description
 
-        Stops the daemon and then waits for it to actually stop running before
-        starting the daemon again.
+        Sends a SIGUSR1 to any daemon that is currently running (see
+        hand_off) and waits (up to daemon.timeout seconds) for it to finish
+        its work in flight and release its pidfile to the successor (which
+        serves from the moment it starts).  If no daemon is running it starts
+        the daemon.
+
+        If the daemon exited without a successor taking its pidfile over (i.e.
+        an older daemon without a handoff was killed by the SIGUSR1) a new
+        daemon is started.
 
         """
 
-        self.stop()
+        if not self.running:
+            logger.warning("Daemon not running.")
+            self.start()
+            return
+
+        pid = self.daemon_pid
+
+        logger.info("Sending daemon, %s, SIGUSR1.", pid)
+        os.kill(pid, signal.SIGUSR1)
+
+        if not self.wait():
+            return
+
+        expires = time.time() + TAKEOVER_TIMEOUT
+
+        while not self.running: # Anyone holding it now took over.
+            if time.time() > expires:
+                logger.warning("No daemon took over from %s; starting one.", pid) # pylint: disable=C0301
+                self.start()
+                return
+
+            time.sleep(HANDOFF_INTERVAL)
 
-        while self.running:
-            time.sleep(1)
+    def wait(self): # pylint: disable=R0201
+        """Wait for the running daemon to exit (release its pidfile).
 
-        self.start()
+        ### Description
+
+        Returns False if it was still running after daemon.timeout seconds.
+
+        """
+
+        timeout = float(SingularityParameters()["daemon.timeout"] or 0) or None
+
+        if not released(SingularityParameters()["daemon.pidfile"], timeout):
+            logger.warning("Daemon still running after %s seconds.", timeout)
+            print("Singularity is still running after {0} seconds ...".format(timeout), file = sys.stderr) # pylint: disable=C0301
+            return False
+
+        return True
 
     def status(self):
-        """Reports the pid of a running daemon."""
+        """Reports the pid and statistics of a running daemon.
+
+        ### Description
+
+        The statistics (see SingularityStatistics) are queried over the
+        daemon's control socket and printed.
+
+        """
+
+        if not self.running:
+            logger.warning("Daemon not running.")
+            print("Singularity is not running ...", file = sys.stderr)
+            return
+
         logger.info("Singularity is running at %s", self.daemon_pid)
+        print("Singularity is running at {0}".format(self.daemon_pid))
+
+        try:
+            statistics = query(control_path())
+        except (IOError, ValueError) as error: # socket.error is an IOError.
+            logger.warning("Unable to query the daemon: %s", error)
+            print("Unable to query the daemon: {0}".format(error), file = sys.stderr) # pylint: disable=C0301
+            return
+
+        print(render(statistics))
 
     @property
     def daemon_pid(self): # pylint: disable=R0201
@@ -200,9 +777,179 @@ class SingularityDaemon(object):
             return None
 
     @property
-    def running(self):
-        """True if the daemon is currently running."""
-        return os.path.exists("/proc/{0}".format(self.daemon_pid))
+    def running(self): # pylint: disable=R0201
+        """True if the daemon is currently running (holds its pidfile lock)."""
+        return locked(SingularityParameters()["daemon.pidfile"])
+
+def pool(wake = None):
+    """Pre-forked configurator worker processes or None.
+
+    ### Arguments
+
+    Argument | Description
+    -------- | -----------
+    wake     | Callable waking the main loop to renew a stale pool
+
+    ### Description
+
+    Returns a SingularityPool of daemon.processes workers that run
+    configurators on behalf of the daemon (see SingularityExecutor) or None
+    if daemon.processes is 0 and configurators run in the daemon itself.
+
+    """
+
+    processes = int(SingularityParameters()["daemon.processes"] or 0)
+
+    if not processes:
+        return None
+
+    return SingularityPool(processes, wake)
+
+def watched(configurators):
+    """Directories watched for changes to reload automatically."""
+    return [ SingularityParameters()["main.configuration"] ] + [ directory for directory in configurators.path if os.access(directory, os.R_OK) ] # pylint: disable=C0301
+
+def locked(path):
+    """True if a process holds the lock on the pidfile at path.
+
+    ### Description
+
+    Unlike checking /proc for the pid in the file this can't be fooled by a
+    stale pidfile whose pid has been recycled.
+
+    """
+
+    try:
+        pidfile = open(path, "r")
+    except IOError as error:
+        if error.errno != errno.ENOENT:
+            raise
+        return False
+
+    with pidfile:
+        try:
+            fcntl.flock(pidfile.fileno(), fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except IOError as error:
+            if error.errno not in [ errno.EAGAIN, errno.EACCES ]:
+                raise
+            return True
+
+    return False
+
+def released(path, timeout = None):
+    """Wait until the lock on the pidfile at path is released.
+
+    ### Arguments
+
+    Argument | Description
+    -------- | -----------
+    path     | The pidfile's path
+    timeout  | Seconds to wait (None waits forever)
+
+    ### Description
+
+    Blocks on the lock itself (in a helper thread so the wait can time out)
+    so this returns as soon as the daemon exits.  Returns False if the lock
+    was still held when the timeout passed.
+
+    """
+
+    try:
+        pidfile = open(path, "r")
+    except IOError as error:
+        if error.errno != errno.ENOENT:
+            raise
+        return True
+
+    def lock():
+        """Block until the lock is ours; the kernel drops it on close."""
+        with pidfile:
+            fcntl.flock(pidfile.fileno(), fcntl.LOCK_SH)
+
+    thread = threading.Thread(target = lock, name = "pidfile")
+    thread.daemon = True
+    thread.start()
+    thread.join(timeout)
+
+    return not thread.is_alive()
+
+def control_path():
+    """Path of the daemon's control socket (see SingularityControl)."""
+    return os.path.join(SingularityParameters()["daemon.run"], "control.sock")
+
+def render(statistics):
+    """Human readable form of a SingularityStatistics snapshot.
+
+    ### Examples
+
+    >>> print(render(query(control_path())))
+    Messages handled:
+      resetnetwork: 2
+    ...
+
+    """
+
+    lines = []
+
+    def timing(name, values):
+        """Line for a timing."""
+        return "  {0}: {1} runs, last {2:.3f}s, p99 {3:.3f}s".format(name, values["count"], values["last"], values["p99"]) # pylint: disable=C0301
+
+    lines.append("Messages handled:")
+    lines.extend([ "  {0}: {1}".format(name.split(".", 1)[1], count) for name, count in sorted(statistics["counters"].iteritems()) if name.startswith("messages.") ]) # pylint: disable=C0301
+
+    lines.append("Handling latency:")
+    if "latency" in statistics["timings"]:
+        lines.append(timing("all", statistics["timings"]["latency"]))
+
+    lines.append("Configurator time:")
+    lines.extend([ timing(name.split(".", 1)[1], values) for name, values in sorted(statistics["timings"].iteritems()) if name.startswith("configurator.") ]) # pylint: disable=C0301
+
+    lines.append("Queue depths:")
+    lines.extend([ "  {0}: {1}".format(name, depth) for name, depth in sorted((statistics["gauges"].get("queues") or {}).iteritems()) ]) # pylint: disable=C0301
+
+    lines.extend([ "{0}: {1}".format(name.capitalize(), value) for name, value in sorted(statistics["gauges"].iteritems()) if name != "queues" ]) # pylint: disable=C0301
+
+    return "\n".join(lines)
+
+def successor():
+    """Command line that starts a successor to this daemon."""
+
+    argv = list(ARGV)
+
+    action = len(argv) - 1 - argv[::-1].index(SingularityParameters()["action"]) # pylint: disable=C0301
+    argv[action] = "start"
+
+    return [ sys.executable ] + argv
+
+def deadlines():
+    """Per-function deadlines (in seconds) from daemon.deadlines.
+
+    ### Description
+
+    Parses the FUNCTION:SECONDS pairs in daemon.deadlines into a dict.  The
+    "default" entry applies to functions without their own entry.  A deadline
+    of 0 means no deadline.
+
+    ### Examples
+
+    >>> deadlines()
+    {'default': 120.0, 'update': 1800.0}
+
+    """
+
+    result = {}
+
+    for item in (SingularityParameters()["daemon.deadlines"] or "").split(","):
+        if not len(item.strip()):
+            continue
+
+        function, seconds = item.split(":", 1)
+        result[function.strip()] = float(seconds) or None
+
+    logger.debug("Deadlines: %s", result)
+
+    return result
 
 class PidFile(object): # pylint: disable=R0903
     """Context manager for handling a locking pidfile.
@@ -218,31 +965,88 @@ class PidFile(object): # pylint: disable=R0903
 
     """
 
-    def __init__(self, path):
+    def __init__(self, path, background = False):
+        """Pidfile at path.
+
+        ### Arguments
+
+        Argument   | Description
+        --------   | -----------
+        path       | The pidfile's path
+        background | Take the pidfile over once a running daemon releases it
+
+        ### Description
+
+        If the pidfile is locked by a running daemon we exit unless background
+        is True (i.e. for the successor of a handoff).  Then a thread waits for
+        the lock and writes our pid once the predecessor has exited.
+
+        """
+
         self.path = path
+        self.background = background
         self.pidfile = None
+        self.locked = False
 
     def __enter__(self):
-        self.pidfile = open(self.path, "a+")
+        if not self._lock(False):
+            if not self.background:
+                raise SystemExit("Found an existing pidfile, %s, exiting.", self.path) # TODO Change this up a bit? # pylint: disable=C0301
 
-        try:
-            fcntl.flock(self.pidfile.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
-        except IOError:
-            raise SystemExit("Found an existing pidfile, %s, exiting.", self.path) # TODO Change this up a bit? # pylint: disable=C0301
+            logger.info("Taking over the pidfile, %s, once it's released.", self.path) # pylint: disable=C0301
+
+            thread = threading.Thread(target = self._lock, args = (True,), name = "pidfile") # pylint: disable=C0301
+            thread.daemon = True
+            thread.start()
+
+        return self
 
-        self.pidfile.seek(0)
-        self.pidfile.truncate()
-        self.pidfile.write(str(os.getpid()))
-        self.pidfile.flush()
-        self.pidfile.seek(0)
+    def _lock(self, blocking):
+        """Lock the pidfile and write our pid; False if it's locked."""
 
-        return self.pidfile
+        while True:
+            pidfile = open(self.path, "a+")
+
+            flags = fcntl.fcntl(pidfile.fileno(), fcntl.F_GETFD)
+            fcntl.fcntl(pidfile.fileno(), fcntl.F_SETFD, flags | fcntl.FD_CLOEXEC) # pylint: disable=C0301
+
+            try:
+                fcntl.flock(pidfile.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB) # pylint: disable=C0301
+            except IOError as error:
+                pidfile.close()
+                if error.errno not in [ errno.EAGAIN, errno.EACCES ]:
+                    raise
+                return False
+
+            # A daemon removes its pidfile before unlocking it; if we waited on
+            # that file start over with the file of the path now.
+            try:
+                if os.fstat(pidfile.fileno()).st_ino == os.stat(self.path).st_ino: # pylint: disable=C0301
+                    break
+            except OSError:
+                pass
+
+            pidfile.close()
+
+        pidfile.seek(0)
+        pidfile.truncate()
+        pidfile.write(str(os.getpid()))
+        pidfile.flush()
+        pidfile.seek(0)
+
+        self.pidfile = pidfile
+        self.locked = True
+
+        return True
 
     def __exit__(self, exc_type = None, exc_value = None, exc_tb = None):
+        if not self.locked: # Still waiting on the predecessor's pidfile.
+            return
+
+        os.remove(self.path) # Before unlocking; see _lock.
         try:
             self.pidfile.close()
         except IOError as error:
             if error.errno != 9:
                 raise
-        os.remove(self.path)
 
@@ -0,0 +1,390 @@
+# Copyright (C) 2012 by Alex Brandt <alunduil@alunduil.com>
+#
+# singularity is freely distributable under the terms of an MIT-style license.
+# See COPYING or http://www.opensource.org/licenses/mit-license.php.
+
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import Queue
+
+from singularity import helpers
+from singularity.statistics import SingularityStatistics
+
+logger = logging.getLogger("console") # pylint: disable=C0103
+
+# Configurators (by class name) loaded in a worker process; see initialize.
+_CONFIGURATORS = None
+
+class DeadlineExceeded(Exception):
+    """Configurators did not finish within the deadline of a run."""
+
+    def __init__(self, configurators, deadline):
+        super(DeadlineExceeded, self).__init__("Configurators, {0}, did not finish within {1} seconds".format(", ".join([ configurator.__class__.__name__ for configurator in configurators ]), deadline)) # pylint: disable=C0301
+        self.configurators = configurators
+        self.deadline = deadline
+
+class SingularityExecutor(object): # pylint: disable=R0903
+    """Runs the configurators for a message concurrently.
+
+    ### Description
+
+    Each configurator's runnable and content are run on a worker thread with
+    at most workers threads running at a time.  A configurator that lists
+    functions in its after attribute is not started until every configurator
+    (in the same run) with one of those functions has finished.
+
+    The results are merged back in the order the configurators were passed so
+    the caller sees the same ordering it would have seen running them one after
+    another.
+
+    If a SingularityPool is passed the worker threads hand each configurator
+    to the pool as a (configurator name, message) job instead of running it
+    in this process.  A configurator that crashes its worker process then
+    only loses that job (which the run's deadline catches) rather than the
+    daemon.  A job that misses the deadline has the pool replaced so its
+    stuck worker is killed rather than lost to every later message.
+
+    ### Examples
+
+    >>> executor = SingularityExecutor(4)
+    >>> executor(configurators.dispatch(message), message)
+    [(<network.NetworkConfigurator object at 0x...>, {'': ''}), ...]
+
+    """
+
+    def __init__(self, workers = 1, pool = None):
+        self.workers = max(1, int(workers or 1))
+        self.pool = pool
+
+    def __call__(self, configurators, message, deadline = None, progress = None): # pylint: disable=C0301
+        """Run the passed configurators against the message.
+
+        ### Arguments
+
+        Argument      | Description
+        --------      | -----------
+        configurators | The configurators to run (list)
+        message       | The message received from the communicator (dict)
+        deadline      | Seconds the whole run may take (None for no limit)
+        progress      | Callable taking (configurator, finished, total)
+
+        ### Description
+
+        Returns a list of (configurator, content) tuples for every runnable
+        configurator in the order the configurators were passed.  If any
+        configurator raises an exception the remaining configurators are still
+        run to completion and the first exception is raised afterwards.
+
+        If the deadline passes before every configurator has finished the run
+        is cancelled: configurators that haven't started are never started,
+        the commands (see helpers.check_call) of those still running are killed
+        and their results discarded when they finish, and DeadlineExceeded is
+        raised naming the configurators still running.
+
+        """
+
+        expires = None
+        if deadline:
+            expires = time.time() + float(deadline)
+
+        configurators = list(configurators)
+
+        pending = list(configurators)
+        running = set()
+        threads = {} # Configurator => thread running it.
+        results = {}
+        errors = []
+
+        finished = Queue.Queue()
+
+        # Held for the whole run so the pool isn't terminated under it (see
+        # SingularityPool).
+        pool = self.pool and self.pool.hold()
+
+        def work(configurator):
+            """Run a single configurator and report back."""
+            content = None
+            started = time.time()
+            try:
+                if pool is not None:
+                    try:
+                        content = pool.apply_async(run, (configurator.__class__.__name__, message)).get(expires and max(0, expires - time.time())) # pylint: disable=C0301
+                    except multiprocessing.TimeoutError:
+                        self.pool.replace(pool)
+                        raise
+                else:
+                    content = run(configurator, message)
+            except Exception as error: # pylint: disable=W0703
+                logger.exception(error)
+                errors.append(error)
+            finally:
+                SingularityStatistics().time("configurator." + configurator.__class__.__name__, time.time() - started) # pylint: disable=C0301
+                finished.put((configurator, content))
+
+        try:
+            while pending or running:
+                for configurator in self._ready(pending, running):
+                    if len(running) >= self.workers:
+                        break
+
+                    logger.debug("Starting configurator, %s", configurator)
+
+                    pending.remove(configurator)
+                    running.add(configurator)
+
+                    thread = threading.Thread(target = work, args = (configurator,)) # pylint: disable=C0301
+                    thread.daemon = True
+                    thread.start()
+
+                    threads[configurator] = thread
+
+                try:
+                    configurator, content = finished.get(timeout = expires and max(0, expires - time.time())) # pylint: disable=C0301
+                except Queue.Empty:
+                    logger.error("Configurators, %s, missed the deadline of %s seconds; cancelling configurators, %s.", list(running), deadline, pending) # pylint: disable=C0301
+
+                    for configurator in running:
+                        helpers.kill(threads[configurator].ident)
+
+                    raise DeadlineExceeded(list(running), deadline)
+
+                logger.debug("Finished configurator, %s", configurator)
+
+                running.remove(configurator)
+                results[configurator] = content
+
+                if progress is not None:
+                    progress(configurator, len(results), len(configurators))
+        finally:
+            if pool is not None:
+                self.pool.release(pool)
+
+        if len(errors):
+            raise errors[0]
+
+        return [ (configurator, results[configurator]) for configurator in configurators if results[configurator] is not None ] # pylint: disable=C0301
+
+    def _ready(self, pending, running): # pylint: disable=R0201
+        """Pending configurators whose ordering constraints are satisfied."""
+
+        ready = []
+
+        for configurator in pending:
+            waiting = [ other for other in pending + list(running) if other is not configurator and other.function in configurator.after ] # pylint: disable=C0301
+            if not len(waiting):
+                ready.append(configurator)
+
+        if not len(ready) and not len(running) and len(pending):
+            logger.warning("Ordering cycle among configurators, %s; running them in the order given.", pending) # pylint: disable=C0301
+            ready.append(pending[0])
+
+        return ready
+
+class SingularityPool(object):
+    """Pre-forked configurator worker processes that can be replaced in use.
+
+    ### Description
+
+    Wraps a multiprocessing pool (created with initialize as its initializer)
+    that runs hold (see hold and release) while they use it.  When a job
+    misses its deadline and is stuck in a worker (see replace) the pool is
+    marked stale and wake is called so the daemon's main loop can renew it;
+    new pools are only forked from there as forking from a lane thread or a
+    signal handler can leave a lock held in the workers.  A renewed or
+    retired (the daemon reloaded) pool is terminated, killing any stuck
+    worker, once the last run holding it has released it.
+
+    ### Examples
+
+    >>> pool = SingularityPool(4, wake)
+    >>> executor = SingularityExecutor(4, pool)
+
+    """
+
+    def __init__(self, processes, wake = None):
+        self.processes = processes
+        self.wake = wake
+        self.stale = False
+
+        self._lock = threading.Lock()
+        self._current = None
+        self._holds = {} # Pool => number of runs holding it.
+        self._retired = set()
+
+        self._start()
+
+    def _start(self):
+        """Start a fresh pool as the current pool."""
+
+        logger.info("Starting %s configurator worker processes.", self.processes) # pylint: disable=C0301
+
+        # Python 2 doesn't reset the logging locks in a forked child so they
+        # are held while forking (no other thread can be holding one).
+        handlers = [ handler for handler in [ reference() for reference in logging._handlerList ] if handler is not None ] # pylint: disable=W0212,C0301
+
+        logging._acquireLock() # pylint: disable=W0212
+        try:
+            for handler in handlers:
+                handler.acquire()
+            try:
+                self._current = multiprocessing.Pool(self.processes, initialize) # pylint: disable=C0301
+            finally:
+                for handler in handlers:
+                    handler.release()
+        finally:
+            logging._releaseLock() # pylint: disable=W0212
+
+        self._holds[self._current] = 0
+
+    def hold(self):
+        """The current multiprocessing pool held by the caller until release.
+
+        ### Description
+
+        Returns None once the pool has been retired or terminated (the caller
+        runs its configurators itself).
+
+        """
+
+        with self._lock:
+            if self._current is None:
+                return None
+
+            self._holds[self._current] += 1
+
+            return self._current
+
+    def release(self, pool):
+        """Release a pool returned by hold."""
+
+        with self._lock:
+            self._holds[pool] -= 1
+
+        self._reap()
+
+    def replace(self, pool):
+        """Mark pool stale (if it's still current) for renew to replace."""
+
+        with self._lock:
+            if pool is not self._current or self.stale:
+                return
+
+            logger.warning("Replacing the configurator worker processes (a job is stuck).") # pylint: disable=C0301
+
+            self.stale = True
+
+        if self.wake is not None:
+            self.wake()
+
+    def renew(self):
+        """Start a fresh pool and retire the current one.
+
+        ### Description
+
+        Called from the daemon's main thread; see replace.
+
+        """
+
+        with self._lock:
+            if self._current is not None:
+                self._retired.add(self._current)
+
+            self._start()
+            self.stale = False
+
+        self._reap()
+
+    def retire(self):
+        """Terminate the pool once no run holds it."""
+
+        with self._lock:
+            if self._current is not None:
+                self._retired.add(self._current)
+                self._current = None
+
+        self._reap()
+
+    def terminate(self):
+        """Terminate every pool now."""
+
+        with self._lock:
+            pools = self._holds.keys()
+
+            self._current = None
+            self._holds.clear()
+            self._retired.clear()
+
+        for pool in pools:
+            pool.terminate()
+
+    def _reap(self):
+        """Terminate the retired pools no run holds."""
+
+        with self._lock:
+            idle = [ pool for pool in self._retired if not self._holds[pool] ]
+
+            for pool in idle:
+                self._retired.discard(pool)
+                del self._holds[pool]
+
+        for pool in idle:
+            pool.terminate()
+
+def initialize():
+    """Prepare a pre-forked worker process for running configurators.
+
+    ### Description
+
+    Used as the initializer of the daemon's multiprocessing pool.  Replaces
+    the daemon's signal handlers (which must not run in the workers) and
+    loads the configurators once for the life of the worker.
+
+    A worker terminated (see SingularityPool) kills the command (see
+    helpers.check_call) its configurator is running before it exits so a
+    stuck command doesn't outlive it.
+
+    """
+
+    global _CONFIGURATORS # pylint: disable=W0603
+
+    def term_handler(signum, frame): # pylint: disable=W0613
+        """Kill the running command and terminate."""
+        helpers.kill()
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, term_handler)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+
+    from singularity.configurators import SingularityConfigurators
+
+    _CONFIGURATORS = dict([ (configurator.__class__.__name__, configurator) for configurator in SingularityConfigurators() ]) # pylint: disable=C0301
+
+def run(configurator, message):
+    """Content of the configurator for message or None if not runnable.
+
+    ### Arguments
+
+    Argument     | Description
+    --------     | -----------
+    configurator | The configurator or, in a worker process, its class name
+    message      | The message received from the communicator (dict)
+
+    """
+
+    if _CONFIGURATORS is not None and isinstance(configurator, basestring):
+        configurator = _CONFIGURATORS[configurator]
+
+    if not configurator.runnable(message):
+        logger.info("Configurator, %s, is not runnable.", configurator)
+        return None
+
+    logger.info("Found configurator, %s, with function, %s", configurator, configurator.function) # pylint: disable=C0301
+
+    return configurator.content(message)
@@ -0,0 +1,139 @@
+# Copyright (C) 2012 by Alex Brandt <alunduil@alunduil.com>
+#
+# singularity is freely distributable under the terms of an MIT-style license.
+# See COPYING or http://www.opensource.org/licenses/mit-license.php.
+
+import logging
+import hashlib
+import json
+import os
+import threading
+
+from singularity.cache import state_path
+
+logger = logging.getLogger("console") # pylint: disable=C0103
+
+BOOT_ID = os.path.join(os.path.sep, "proc", "sys", "kernel", "random", "boot_id") # pylint: disable=C0301
+
+class SingularityFingerprints(object):
+    """Dict-like record of the inputs each function last applied.
+
+    ### Description
+
+    Maps function names to a stable hash (see fingerprint) of the message
+    items the function's configurators consumed the last time the function
+    was applied successfully.  The record is written to the state directory in
+    the cache so it persists across restarts of the daemon but it's tied to
+    the current boot (see boot_id); the record of a previous boot is
+    discarded.
+
+    ### Examples
+
+    >>> fingerprints = SingularityFingerprints()
+    >>> fingerprints["hostname"]
+    '0c1b4c6f3f1e0a0e5d6b7a5b5ee1c9f1e2b2e5a4'
+
+    """
+
+    def __init__(self, path = None):
+        self.path = path or state_path("fingerprints")
+
+        self._lock = threading.Lock()
+        self._fingerprints = {}
+
+        self.boot = boot_id()
+
+        try:
+            with open(self.path, "r") as fingerprints:
+                record = json.load(fingerprints)
+
+            if record.get("boot") == self.boot:
+                self._fingerprints = record["fingerprints"]
+            else:
+                logger.info("Discarding the fingerprints of boot, %s", record.get("boot")) # pylint: disable=C0301
+        except (IOError, ValueError, KeyError, AttributeError) as error:
+            logger.info("No fingerprints loaded from %s: %s", self.path, error) # pylint: disable=C0301
+
+        logger.debug("Fingerprints: %s", self._fingerprints)
+
+    def __getitem__(self, key):
+        return self._fingerprints[key]
+
+    def __contains__(self, key):
+        return key in self._fingerprints
+
+    def get(self, key, default = None):
+        """The fingerprint of the function or default."""
+        return self._fingerprints.get(key, default)
+
+    def unchanged(self, fingerprints):
+        """Functions whose passed fingerprint matches the recorded one."""
+        return set([ function for function, value in fingerprints.iteritems() if self.get(function) == value ]) # pylint: disable=C0301
+
+    def update(self, fingerprints):
+        """Record the passed fingerprints and write them to the cache."""
+
+        if not len(fingerprints):
+            return
+
+        with self._lock:
+            self._fingerprints.update(fingerprints)
+
+            if not os.path.exists(os.path.dirname(self.path)):
+                os.makedirs(os.path.dirname(self.path))
+
+            with open(self.path + ".tmp", "w") as output:
+                json.dump({ "boot": self.boot, "fingerprints": self._fingerprints }, output) # pylint: disable=C0301
+
+            os.rename(self.path + ".tmp", self.path)
+
+def boot_id():
+    """The identifier of the current boot (None if it can't be read)."""
+
+    try:
+        with open(BOOT_ID, "r") as boot:
+            return boot.read().strip()
+    except IOError as error:
+        logger.info("No boot id read from %s: %s", BOOT_ID, error)
+        return None
+
+def fingerprint(configurators, message):
+    """Fingerprints of the message for each idempotent function.
+
+    ### Arguments
+
+    Argument      | Description
+    --------      | -----------
+    configurators | The configurators dispatched for the message (list)
+    message       | The message received from the communicator (dict)
+
+    ### Description
+
+    Returns a dict mapping each function whose configurators are all
+    idempotent to a hash of the message items named in those configurators'
+    required_keys and fingerprint_keys.  A function with any configurator
+    that isn't idempotent is never fingerprinted (and so never skipped).
+
+    Lists are hashed in the order received; a reordering produces a new
+    fingerprint and simply causes the function to be applied again.
+
+    """
+
+    keys = {}
+
+    for configurator in configurators:
+        keys.setdefault(configurator.function, set()).update(configurator.required_keys | configurator.fingerprint_keys) # pylint: disable=C0301
+
+    for configurator in configurators:
+        if not configurator.idempotent:
+            keys.pop(configurator.function, None)
+
+    fingerprints = {}
+
+    for function, names in keys.iteritems():
+        inputs = dict([ (name, message[name]) for name in names if name in message ]) # pylint: disable=C0301
+        fingerprints[function] = hashlib.sha1(json.dumps(inputs, sort_keys = True)).hexdigest() # pylint: disable=E1101,C0301
+
+    logger.debug("Fingerprints of message: %s", fingerprints)
+
+    return fingerprints
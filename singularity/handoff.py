@@ -0,0 +1,168 @@
+# Copyright (C) 2012 by Alex Brandt <alunduil@alunduil.com>
+#
+# singularity is freely distributable under the terms of an MIT-style license.
+# See COPYING or http://www.opensource.org/licenses/mit-license.php.
+
+import logging
+import errno
+import json
+import os
+import select
+import time
+
+from singularity.parameters import SingularityParameters
+
+logger = logging.getLogger("console") # pylint: disable=C0103
+
+# Environment variable naming the handoff file.  Only set by a daemon handing
+# off to its successor so a stale file (i.e. from a crash) is never used.
+ENVIRONMENT = "SINGULARITY_HANDOFF"
+
+def save(state):
+    """Write the state handed to a successor and return its path.
+
+    ### Arguments
+
+    Argument | Description
+    -------- | -----------
+    state    | The state to hand off (JSON serializable dict)
+
+    ### Description
+
+    The state includes key material (i.e. the keyinit session) so the file
+    is only readable by the daemon's user and is written to daemon.run (not
+    the persistent cache) so it can't outlive a reboot.  Expected keys:
+
+    Key          | Description
+    ---          | -----------
+    communicator | State for the communicator's handoff argument
+    descriptors  | File descriptors the successor inherits
+    messages     | (identifier, message) pairs not yet handled
+    jobs         | (job id, message) pairs not yet started
+    ready        | Descriptor the successor reports its startup on (see
+                   notify)
+
+    """
+
+    path = os.path.join(SingularityParameters()["daemon.run"], "handoff")
+
+    if not os.path.exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+
+    with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as output: # pylint: disable=C0301
+        json.dump(state, output)
+
+    logger.info("Handing off %s messages and %s jobs through %s", len(state.get("messages", [])), len(state.get("jobs", [])), path) # pylint: disable=C0301
+
+    return path
+
+def load():
+    """The state handed off by a predecessor or an empty dict.
+
+    ### Description
+
+    Reads (and removes) the file named by the ENVIRONMENT variable if it is
+    set.  The variable is cleared so nothing started by this daemon sees it.
+
+    """
+
+    path = os.environ.pop(ENVIRONMENT, None)
+
+    if path is None:
+        return {}
+
+    try:
+        with open(path, "r") as state:
+            result = json.load(state)
+    except (IOError, ValueError) as error:
+        logger.error("Unable to load the handoff from %s: %s", path, error)
+        return {}
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+    logger.info("Taking over %s messages and %s jobs from %s", len(result.get("messages", [])), len(result.get("jobs", [])), path) # pylint: disable=C0301
+
+    return result
+
+def notify(state, *assignments):
+    """Report the assignments to the predecessor that handed off state.
+
+    ### Description
+
+    Writes each assignment (i.e. "MAINPID=1234") as a line on the handoff's
+    ready descriptor (see wait) like activation.notify does for a service
+    manager.  The descriptor is closed once READY=1 has been sent.  Does
+    nothing if this daemon wasn't started by a handoff.
+
+    """
+
+    descriptor = state.get("ready")
+
+    if descriptor is None:
+        return
+
+    try:
+        os.write(descriptor, "".join([ assignment + "\n" for assignment in assignments ])) # pylint: disable=C0301
+    except OSError as error:
+        logger.warning("Unable to notify the predecessor: %s", error)
+
+    if "READY=1" in assignments:
+        os.close(descriptor)
+        state["ready"] = None
+
+def wait(descriptor, timeout = None):
+    """The assignments a successor reported on descriptor (see notify).
+
+    ### Arguments
+
+    Argument   | Description
+    --------   | -----------
+    descriptor | The read end of the handoff's ready pipe
+    timeout    | Seconds to wait for READY=1 (None waits forever)
+
+    ### Description
+
+    Returns a dict of the assignments read once READY=1 has been read, every
+    copy of the pipe's write end is closed (the successor died) or timeout
+    seconds have passed.  Only READY=1 being in the result means the
+    successor is serving.
+
+    """
+
+    expires = timeout and time.time() + timeout
+
+    assignments = {}
+    buffered = ""
+
+    while assignments.get("READY") != "1":
+        remaining = None
+        if expires is not None:
+            remaining = expires - time.time()
+            if remaining <= 0:
+                logger.warning("The successor didn't report ready within %s seconds.", timeout) # pylint: disable=C0301
+                break
+
+        try:
+            if not len(select.select([ descriptor ], [], [], remaining)[0]):
+                continue
+
+            data = os.read(descriptor, 4096)
+        except (select.error, OSError) as error:
+            if error.args[0] != errno.EINTR:
+                raise
+            continue
+
+        if not len(data):
+            logger.warning("The successor exited before reporting ready.")
+            break
+
+        buffered += data
+
+        while "\n" in buffered:
+            line, buffered = buffered.split("\n", 1)
+            if "=" in line:
+                name, value = line.split("=", 1)
+                assignments[name] = value
+
+    return assignments
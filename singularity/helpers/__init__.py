@@ -5,6 +5,9 @@
 
 import logging
 import os
+import signal
+import subprocess
+import threading
 
 logger = logging.getLogger("console") # pylint: disable=C0103
 
@@ -13,3 +16,87 @@ VIRTUAL = "physical"
 if os.access(os.path.join(os.path.sep, "proc", "xen", "capabilities"), os.R_OK):
     VIRTUAL = "xenU"
 
+
+# Thread identifier => command (subprocess.Popen) check_call is waiting on
+# in that thread (see kill).
+PROCESSES = {}
+
+# Tool name => resolved path (see which).  Seeded from the daemon's warm-start
+# snapshot (see singularity.snapshot).
+TOOLS = {}
+
+def which(name):
+    """Path of the executable, name, or None if it can't be found.
+
+    ### Description
+
+    Resolved paths are remembered and reused while they're still executable
+    so the configurators' runnable checks don't run which for every message.
+    Tools that can't be found are looked for again on the next call.
+
+    """
+
+    path = TOOLS.get(name)
+
+    if path is not None and os.access(path, os.X_OK):
+        return path
+
+    try:
+        path = subprocess.check_output("which " + name, shell = True).strip() # pylint: disable=E1103,C0301
+    except subprocess.CalledProcessError:
+        return None
+
+    TOOLS[name] = path
+
+    return path
+
+def check_call(command, **kwargs):
+    """Run command like subprocess.check_call in its own process group.
+
+    ### Arguments
+
+    Argument | Description
+    -------- | -----------
+    command  | The command to run (list or str)
+    kwargs   | Passed through to subprocess.Popen
+
+    ### Description
+
+    The command is remembered against the calling thread while it runs so
+    kill can cancel it (and anything it started) when a configurator misses
+    its deadline.  A killed command raises CalledProcessError like any other
+    failed command.
+
+    """
+
+    process = subprocess.Popen(command, preexec_fn = os.setpgrp, **kwargs)
+
+    thread = threading.current_thread().ident
+
+    PROCESSES[thread] = process
+    try:
+        returncode = process.wait()
+    finally:
+        PROCESSES.pop(thread, None)
+
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, command)
+
+    return 0
+
+def kill(thread = None):
+    """Kill the commands check_call is running in thread (None for all)."""
+
+    for identifier, process in PROCESSES.items():
+        if thread is not None and identifier != thread:
+            continue
+
+        if process.returncode is not None:
+            continue
+
+        logger.warning("Killing process group, %s.", process.pid)
+
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except OSError as error:
+            logger.debug("Could not kill process group, %s: %s", process.pid, error) # pylint: disable=C0301
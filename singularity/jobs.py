@@ -0,0 +1,165 @@
+# Copyright (C) 2012 by Alex Brandt <alunduil@alunduil.com>
+#
+# singularity is freely distributable under the terms of an MIT-style license.
+# See COPYING or http://www.opensource.org/licenses/mit-license.php.
+
+import logging
+import collections
+import copy
+import threading
+import time
+import uuid
+import Queue
+
+logger = logging.getLogger("console") # pylint: disable=C0103
+
+# Function of the messages asking for the status of a job.  The job id is
+# passed as the message's arguments.
+STATUS = "jobstatus"
+
+class SingularityJobs(object):
+    """Background jobs for long-running functions.
+
+    ### Description
+
+    Messages submitted here are run one after another on a background thread
+    by the runner passed in.  submit returns a job id immediately so the
+    hypervisor can be acknowledged while the job (i.e. an emerge for
+    agentupdate) is still running.  The job's state, progress and response
+    can be looked up by id until limit newer jobs have been submitted.
+
+    Job states are queued, running, succeeded and failed.
+
+    ### Examples
+
+    >>> jobs = SingularityJobs(runner, [ "update" ])
+    >>> job_id = jobs.submit(message)
+    >>> jobs[job_id]["state"]
+    'running'
+
+    """
+
+    def __init__(self, runner, functions = None, limit = 32, done = None):
+        """Start the thread running the jobs.
+
+        ### Arguments
+
+        Argument  | Description
+        --------  | -----------
+        runner    | Callable taking (message, progress) returning the response
+        functions | The functions run as background jobs
+        limit     | The number of finished jobs remembered
+        done      | Callable taking the job id of each finished job
+
+        """
+
+        self._runner = runner
+        self.functions = set(functions or [])
+        self.limit = limit
+
+        self._done = done
+
+        self._jobs = collections.OrderedDict()
+        self._queue = Queue.Queue()
+
+        self.thread = threading.Thread(target = self._serve, name = "jobs")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def __contains__(self, job_id):
+        return job_id in self._jobs
+
+    def __getitem__(self, job_id):
+        """Snapshot of the job's record."""
+        return copy.deepcopy(self._jobs[job_id])
+
+    @property
+    def depth(self):
+        """The number of jobs waiting to run."""
+        return self._queue.qsize()
+
+    @property
+    def idle(self):
+        """True if no job is queued or running."""
+        return not len([ job for job in self._jobs.itervalues() if job["state"] in [ "queued", "running" ] ]) # pylint: disable=C0301
+
+    def drain(self):
+        """Remove and return the (job id, message) pairs not yet started."""
+
+        result = []
+
+        while True:
+            try:
+                job_id, message = self._queue.get_nowait()
+            except Queue.Empty:
+                break
+
+            del self._jobs[job_id]
+            result.append((job_id, message))
+
+        return result
+
+    def submit(self, message, job_id = None):
+        """Queue the message as a job and return the job's id.
+
+        ### Description
+
+        A job id is only passed when taking over a job from a predecessor (see
+        SingularityJobs.drain).
+
+        """
+
+        job_id = job_id or uuid.uuid4().hex
+
+        self._jobs[job_id] = {
+                "id": job_id,
+                "function": message.get("function"),
+                "state": "queued",
+                "progress": "",
+                "response": None,
+                "submitted": time.time(),
+                "finished": None,
+                }
+
+        while len(self._jobs) > self.limit:
+            oldest = self._jobs.keys()[0]
+            if self._jobs[oldest]["state"] in [ "queued", "running" ]:
+                break
+            del self._jobs[oldest]
+
+        logger.info("Queueing job, %s, for function, %s", job_id, message.get("function")) # pylint: disable=C0301
+
+        self._queue.put((job_id, message))
+
+        return job_id
+
+    def _serve(self):
+        """Run queued jobs forever."""
+
+        while True:
+            job_id, message = self._queue.get()
+
+            job = self._jobs[job_id]
+            job["state"] = "running"
+
+            logger.info("Running job, %s", job_id)
+
+            def progress(text, job = job):
+                """Record the job's progress."""
+                logger.info("Job, %s, progress: %s", job["id"], text)
+                job["progress"] = text
+
+            try:
+                job["response"] = self._runner(message, progress)
+                job["state"] = "succeeded"
+            except Exception as error: # pylint: disable=W0703
+                logger.exception(error)
+                job["response"] = str(error)
+                job["state"] = "failed"
+
+            job["finished"] = time.time()
+
+            logger.info("Job, %s, %s", job_id, job["state"])
+
+            if self._done is not None:
+                self._done(job_id)
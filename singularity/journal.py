@@ -0,0 +1,169 @@
+# Copyright (C) 2012 by Alex Brandt <alunduil@alunduil.com>
+#
+# singularity is freely distributable under the terms of an MIT-style license.
+# See COPYING or http://www.opensource.org/licenses/mit-license.php.
+
+import logging
+import json
+import os
+import threading
+import uuid
+
+from singularity.cache import state_path
+
+logger = logging.getLogger("console") # pylint: disable=C0103
+
+class SingularityJournal(object):
+    """Append-only journal of the messages the daemon has accepted.
+
+    ### Description
+
+    Each accepted message is appended (and synced to disk) before it's handled
+    and its completion is appended once it has been answered.  If the daemon
+    dies in between the next daemon finds the entry in unfinished and can
+    resume or answer it before taking new messages.  Communicators that take
+    messages off the hypervisor's channel before they're received (i.e.
+    XenCommunicator removing them from xenstore) accept them as raw (not yet
+    translated) messages, which they resume themselves.
+
+    Messages carrying a password are journalled without their content so no
+    plaintext password reaches the disk; they can only be answered with an
+    error.
+
+    The journal is compacted to its unfinished entries when it's loaded and
+    truncated once more than limit lines have been written and nothing is in
+    flight.  It's never truncated while another daemon may be appending to
+    it (see exclusive) as that daemon's entries would be lost.
+
+    ### Examples
+
+    >>> journal = SingularityJournal()
+    >>> entry = journal.accept(identifier, message)
+    >>> journal.finish(entry)
+
+    """
+
+    def __init__(self, path = None, limit = 1024, resume = True, exclusive = None): # pylint: disable=C0301
+        """Open the journal and load its unfinished entries if resume.
+
+        ### Arguments
+
+        Argument  | Description
+        --------  | -----------
+        path      | The journal's path (defaults to the state directory)
+        limit     | Lines written before the journal is truncated
+        resume    | Load (and compact) unfinished entries (False when a
+                    predecessor handing off is still writing the journal)
+        exclusive | Callable returning False while another daemon may append
+                    to the journal (None if this daemon is the only one)
+
+        """
+
+        self.path = path or state_path("journal")
+        self.limit = limit
+        self.exclusive = exclusive or (lambda: True)
+
+        self._lock = threading.Lock()
+        self._inflight = set()
+        self._lines = 0
+
+        self.unfinished = []
+
+        if not os.path.exists(os.path.dirname(self.path)):
+            os.makedirs(os.path.dirname(self.path))
+
+        if resume:
+            self._load()
+
+        self._journal = open(self.path, "a")
+
+    def _load(self):
+        """Find the unfinished entries and compact the journal to them."""
+
+        entries = {}
+
+        try:
+            with open(self.path, "r") as journal:
+                for line in journal:
+                    try:
+                        record = json.loads(line)
+                    except ValueError: # Torn write when the daemon died.
+                        logger.warning("Skipping corrupt journal record: %s", line) # pylint: disable=C0301
+                        continue
+
+                    if "finished" in record:
+                        entries.pop(record["finished"], None)
+                    else:
+                        entries[record["entry"]] = record
+        except IOError as error:
+            logger.info("No journal loaded from %s: %s", self.path, error)
+
+        self.unfinished = sorted(entries.values(), key = lambda record: record["accepted"]) # pylint: disable=C0301
+        self._inflight = set(entries.keys())
+
+        with open(self.path + ".tmp", "w") as output:
+            for record in self.unfinished:
+                output.write(json.dumps(record) + "\n")
+
+        os.rename(self.path + ".tmp", self.path)
+
+        self._lines = len(self.unfinished)
+
+        logger.info("Unfinished journal entries: %s", [ record["entry"] for record in self.unfinished ]) # pylint: disable=C0301
+
+    def _append(self, record):
+        """Append record and sync it to disk."""
+
+        self._journal.write(json.dumps(record) + "\n")
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+        self._lines += 1
+
+    def accept(self, identifier, message, job = None, raw = False):
+        """Journal an accepted message and return its entry id.
+
+        ### Arguments
+
+        Argument   | Description
+        --------   | -----------
+        identifier | The identifier of the message
+        message    | The message received from the communicator (dict)
+        job        | The id of the job running the message (if any)
+        raw        | True if message is as read by the communicator (str or
+                     None for a password)
+
+        """
+
+        entry = uuid.uuid4().hex
+
+        if not raw and "password" in message:
+            message = None
+
+        with self._lock:
+            self._append({
+                "entry": entry,
+                "accepted": self._lines,
+                "identifier": identifier,
+                "message": message,
+                "job": job,
+                "raw": raw,
+                })
+            self._inflight.add(entry)
+
+        return entry
+
+    def finish(self, entry):
+        """Journal the completion of entry (ignores None)."""
+
+        if entry is None:
+            return
+
+        with self._lock:
+            self._append({ "finished": entry })
+            self._inflight.discard(entry)
+
+            if not len(self._inflight) and self._lines > self.limit and self.exclusive(): # pylint: disable=C0301
+                logger.info("Truncating the journal, %s", self.path)
+                self._journal.truncate(0)
+                self._lines = 0
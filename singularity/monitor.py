@@ -0,0 +1,104 @@
+# Copyright (C) 2012 by Alex Brandt <alunduil@alunduil.com>
+#
+# singularity is freely distributable under the terms of an MIT-style license.
+# See COPYING or http://www.opensource.org/licenses/mit-license.php.
+
+import logging
+import os
+import threading
+import time
+
+from singularity.statistics import SingularityStatistics
+
+logger = logging.getLogger("console") # pylint: disable=C0103
+
+DESCRIPTORS = os.path.join(os.path.sep, "proc", "self", "fd")
+
+class SingularityFdMonitor(object):
+    """Samples the daemon's open file descriptors to catch leaks.
+
+    ### Description
+
+    Every interval seconds the number of open descriptors is published as the
+    "descriptors" gauge in SingularityStatistics.  When the count rises above
+    threshold the path behind every descriptor is logged once; the dump is
+    re-armed when the count falls back to the threshold.
+
+    An interval of 0 disables the monitor: no thread is started and nothing is
+    sampled.
+
+    ### Examples
+
+    >>> monitor = SingularityFdMonitor(60, 256)
+    >>> monitor.interval = 0 # Stops after the current sleep.
+
+    """
+
+    def __init__(self, interval = 0, threshold = 0):
+        self.interval = float(interval or 0)
+        self.threshold = int(threshold or 0)
+
+        self.thread = None
+        self._dumped = False
+
+        self.start()
+
+    def start(self):
+        """Start sampling unless disabled or already sampling."""
+
+        if not self.interval or self.thread is not None and self.thread.is_alive(): # pylint: disable=C0301
+            return
+
+        self.thread = threading.Thread(target = self._serve, name = "fdmonitor") # pylint: disable=C0301
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _serve(self):
+        """Sample until the interval is set to 0."""
+
+        while self.interval:
+            count = len(os.listdir(DESCRIPTORS))
+
+            SingularityStatistics().gauge("descriptors", count)
+
+            if self.threshold and count > self.threshold:
+                if not self._dumped:
+                    logger.warning("Open descriptors, %s, above threshold, %s: %s", count, self.threshold, descriptors()) # pylint: disable=C0301
+                    self._dumped = True
+            else:
+                self._dumped = False
+
+            time.sleep(self.interval)
+
+def descriptors():
+    """Paths of the open file descriptors of this process."""
+
+    result = {}
+
+    for descriptor in os.listdir(DESCRIPTORS):
+        try:
+            result[int(descriptor)] = os.readlink(os.path.join(DESCRIPTORS, descriptor)) # pylint: disable=C0301
+        except OSError: # Closed (i.e. the listdir's own descriptor) since.
+            continue
+
+    return result
+
+def subprocesses():
+    """Number of live child processes of this process."""
+
+    pid = str(os.getpid())
+    count = 0
+
+    for entry in os.listdir(os.path.join(os.path.sep, "proc")):
+        if not entry.isdigit():
+            continue
+
+        try:
+            with open(os.path.join(os.path.sep, "proc", entry, "stat"), "r") as stat: # pylint: disable=C0301
+                # pid (comm) state ppid ...; comm may contain spaces.
+                if stat.read().rsplit(")", 1)[1].split()[1] == pid:
+                    count += 1
+        except (IOError, IndexError): # Exited since the listdir.
+            continue
+
+    return count
@@ -146,6 +146,151 @@ DAEMON_PARAMETERS = [
                     "or by the administrator.  Defaults to []; which " \
                     "includes no extra directories.",
             },
+        { # --workers=COUNT; COUNT => 4
+            "options": [ "--workers" ],
+            "default": 4,
+            "type": int,
+            "metavar": "COUNT",
+            "help": \
+                    "The number of configurators the daemon runs " \
+                    "concurrently for a single message.  Configurators that " \
+                    "must run after others (i.e. resolvers after network) " \
+                    "still wait for them.  COUNT defaults to 4.",
+            },
+        { # --fast=FUNCTIONS; FUNCTIONS => version,features,keyinit
+            "options": [ "--fast" ],
+            "default": "version,features,keyinit",
+            "metavar": "FUNCTIONS",
+            "help": \
+                    "The functions that are answered on the daemon's fast " \
+                    "lane.  These should be cheap and read-only; they are " \
+                    "answered while slower functions (i.e. resetnetwork, " \
+                    "update) are still running.  FUNCTIONS defaults to " \
+                    "\"version,features,keyinit\".",
+            },
+        { # --coalesce=SECONDS; SECONDS => 0.5
+            "options": [ "--coalesce" ],
+            "default": 0.5,
+            "type": float,
+            "metavar": "SECONDS",
+            "help": \
+                    "The window in which a burst of resetnetwork messages " \
+                    "is collapsed into the newest one.  The newest message " \
+                    "is applied once and every message folded into it " \
+                    "receives its response.  0 disables coalescing.  " \
+                    "SECONDS defaults to 0.5.",
+            },
+        { # --responses=COUNT; COUNT => 64
+            "options": [ "--responses" ],
+            "default": 64,
+            "type": int,
+            "metavar": "COUNT",
+            "help": \
+                    "The number of responses remembered (across restarts) " \
+                    "so replayed or retried messages are answered without " \
+                    "running their configurators again.  0 disables the " \
+                    "cache.  COUNT defaults to 64.",
+            },
+        { # --deadlines=DEADLINES; DEADLINES => default:120,update:1800
+            "options": [ "--deadlines" ],
+            "default": "default:120,update:1800",
+            "metavar": "DEADLINES",
+            "help": \
+                    "Comma separated FUNCTION:SECONDS pairs giving the " \
+                    "time the daemon may spend handling a message with " \
+                    "that function before it is cancelled and answered " \
+                    "with an error.  The default entry applies to all " \
+                    "other functions and 0 disables a deadline.  DEADLINES " \
+                    "defaults to \"default:120,update:1800\".",
+            },
+        { # --processes=COUNT; COUNT => 0
+            "options": [ "--processes" ],
+            "default": 0,
+            "type": int,
+            "metavar": "COUNT",
+            "help": \
+                    "The number of long-lived worker processes forked to " \
+                    "run configurators.  A configurator that crashes only " \
+                    "takes down its worker instead of the daemon.  0 runs " \
+                    "configurators in the daemon itself.  COUNT defaults " \
+                    "to 0.",
+            },
+        { # --background=FUNCTIONS; FUNCTIONS => update
+            "options": [ "--background" ],
+            "default": "update",
+            "metavar": "FUNCTIONS",
+            "help": \
+                    "The functions run as background jobs.  The hypervisor " \
+                    "is answered immediately with a job id which can be " \
+                    "passed to a jobstatus message to follow the job.  " \
+                    "FUNCTIONS defaults to \"update\".",
+            },
+        { # --fdinterval=SECONDS; SECONDS => 60
+            "options": [ "--fdinterval" ],
+            "default": 60,
+            "type": float,
+            "metavar": "SECONDS",
+            "help": \
+                    "Seconds between samples of the number of open file " \
+                    "descriptors (to catch descriptor leaks).  0 disables " \
+                    "the sampling.  SECONDS defaults to 60.",
+            },
+        { # --fdthreshold=COUNT; COUNT => 256
+            "options": [ "--fdthreshold" ],
+            "default": 256,
+            "type": int,
+            "metavar": "COUNT",
+            "help": \
+                    "Number of open file descriptors above which the path " \
+                    "of every open descriptor is logged.  0 disables the " \
+                    "logging.  COUNT defaults to 256.",
+            },
+        { # --watch=SECONDS; SECONDS => 1
+            "options": [ "--watch" ],
+            "default": 1,
+            "type": float,
+            "metavar": "SECONDS",
+            "help": \
+                    "Reload automatically when singularity.conf or a " \
+                    "configurator changes once no further changes have " \
+                    "been seen for SECONDS.  0 disables the automatic " \
+                    "reload.  SECONDS defaults to 1.",
+            },
+        { # --timeout=SECONDS; SECONDS => 60
+            "options": [ "--timeout" ],
+            "default": 60,
+            "type": float,
+            "metavar": "SECONDS",
+            "help": \
+                    "The time stop and restart wait for the running daemon " \
+                    "to exit.  A restart waits for the work in flight to " \
+                    "finish before the daemon exits.  A daemon handing off " \
+                    "waits as long for its successor to report it's ready " \
+                    "before carrying on itself.  0 waits forever.  SECONDS " \
+                    "defaults to 60.",
+            },
+        { # --networking=SECONDS; SECONDS => 30
+            "options": [ "--networking" ],
+            "default": 30,
+            "type": float,
+            "metavar": "SECONDS",
+            "help": \
+                    "The time a resetnetwork waits for the hypervisor to " \
+                    "write the networking data of every interface before " \
+                    "the interfaces found are configured.  0 waits " \
+                    "forever.  SECONDS defaults to 30.",
+            },
+        { # --keyinit=SECONDS; SECONDS => 60
+            "options": [ "--keyinit" ],
+            "default": 60,
+            "type": float,
+            "metavar": "SECONDS",
+            "help": \
+                    "The time a password received before the hypervisor's " \
+                    "keyinit is held for the keyinit before it's answered " \
+                    "with an error.  0 waits forever.  SECONDS defaults to " \
+                    "60.",
+            },
         ]
 
 DEFAULTS = {}
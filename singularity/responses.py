@@ -0,0 +1,102 @@
+# Copyright (C) 2012 by Alex Brandt <alunduil@alunduil.com>
+#
+# singularity is freely distributable under the terms of an MIT-style license.
+# See COPYING or http://www.opensource.org/licenses/mit-license.php.
+
+import logging
+import collections
+import hashlib
+import json
+import os
+import threading
+
+from singularity.cache import state_path
+
+logger = logging.getLogger("console") # pylint: disable=C0103
+
+class SingularityResponses(object):
+    """Bounded, persistent dict-like of responses already sent.
+
+    ### Description
+
+    Maps message keys (see response_key) to the (response, status) sent back
+    for them.  When a replayed or retried message arrives with a key already
+    present the stored response can be sent again without running any
+    configurators.
+
+    Only the limit most recent responses are kept.  The responses are written
+    to the state directory in the cache so replays after a restart (i.e. the
+    entries XenCommunicator finds in data/host at startup) are answered too.
+
+    ### Examples
+
+    >>> responses = SingularityResponses(64)
+    >>> responses[response_key(identifier, message)] = ("9999", 0)
+    >>> response_key(identifier, message) in responses
+    True
+
+    """
+
+    def __init__(self, limit = 64, path = None):
+        self.limit = int(limit or 0)
+        self.path = path or state_path("responses")
+
+        self._lock = threading.Lock()
+        self._responses = collections.OrderedDict()
+
+        try:
+            with open(self.path, "r") as responses:
+                for key, response, status in json.load(responses):
+                    self._responses[key] = (response, status)
+        except (IOError, ValueError) as error:
+            logger.info("No responses loaded from %s: %s", self.path, error) # pylint: disable=C0301
+
+        logger.debug("Cached responses: %s", self._responses.keys())
+
+    def __len__(self):
+        return len(self._responses)
+
+    def __contains__(self, key):
+        return key in self._responses
+
+    def __getitem__(self, key):
+        return self._responses[key]
+
+    def __setitem__(self, key, value):
+        """Store the (response, status) for key and write the cache."""
+
+        if not self.limit or key is None:
+            return
+
+        with self._lock:
+            self._responses.pop(key, None)
+            self._responses[key] = value
+
+            while len(self._responses) > self.limit:
+                self._responses.popitem(last = False)
+
+            if not os.path.exists(os.path.dirname(self.path)):
+                os.makedirs(os.path.dirname(self.path))
+
+            with open(self.path + ".tmp", "w") as output:
+                json.dump([ [ key_, response, status ] for key_, (response, status) in self._responses.iteritems() ], output) # pylint: disable=C0301
+
+            os.rename(self.path + ".tmp", self.path)
+
+def response_key(identifier, message):
+    """Key of a message in SingularityResponses.
+
+    ### Description
+
+    Combines the identifier with a hash of the message so a new request that
+    happens to reuse an identifier is not answered from the cache.
+
+    Messages carrying a password are never cached (None is returned) so
+    nothing derived from the password is written to disk.
+
+    """
+
+    if "password" in message:
+        return None
+
+    return "{0}:{1}".format(identifier, hashlib.sha1(json.dumps(message, sort_keys = True)).hexdigest()) # pylint: disable=E1101,C0301
@@ -0,0 +1,279 @@
+# Copyright (C) 2012 by Alex Brandt <alunduil@alunduil.com>
+#
+# singularity is freely distributable under the terms of an MIT-style license.
+# See COPYING or http://www.opensource.org/licenses/mit-license.php.
+
+import logging
+import threading
+import time
+import Queue
+
+logger = logging.getLogger("console") # pylint: disable=C0103
+
+# Seconds between the watchdog's checks of the lanes and the time a lane may
+# overrun its message's deadline before the watchdog replaces it.
+WATCHDOG_INTERVAL = 1
+WATCHDOG_GRACE = 5
+
+class SingularityScheduler(object):
+    """Priority lanes for the messages received by the daemon.
+
+    ### Description
+
+    Messages are placed on one of two lanes based on their function:
+
+    Lane | Description
+    ---- | -----------
+    fast | Cheap, read-only functions (i.e. version, features, keyinit)
+    slow | Everything else (i.e. resetnetwork, agentupdate)
+
+    Each lane is served by its own thread so a slow configuration (i.e. an
+    emerge for agentupdate) never holds up the answers to the hypervisor's
+    health probes.  Messages within a lane are handled in the order they were
+    submitted.
+
+    Bursts of messages whose functions are listed in coalesce (i.e. several
+    resetnetwork requests written during a migration) are collapsed: once the
+    first arrives we wait until window seconds have passed since it was
+    submitted and fold every following message with the same function into
+    the newest one.  The newest message is handled once and its response is
+    sent to every identifier that was folded in.  Any other message arriving
+    in the window ends it early so ordering between functions is kept.
+
+    If a deadline callable is passed a watchdog thread checks how long each
+    lane has been handling its current message.  A lane that overruns the
+    message's deadline (plus WATCHDOG_GRACE) is reported, expired is called
+    with the stuck message so it can be answered, and a new thread takes over
+    the lane.  The stuck thread exits if it ever returns.  A handler claims
+    (see claim) the identifiers it is about to answer so each message is
+    answered either by the handler or by expired but never by both.
+
+    ### Examples
+
+    >>> scheduler = SingularityScheduler(handler, [ "version", "features" ], [ "resetnetwork" ], 0.5) # pylint: disable=C0301
+    >>> scheduler.submit(identifier, message)
+    >>> scheduler.depths
+    {'fast': 0, 'slow': 1}
+
+    """
+
+    def __init__(self, handler, fast = None, coalesce = None, window = 0, deadline = None, expired = None): # pylint: disable=R0913,C0301
+        """Start the threads serving each lane.
+
+        ### Arguments
+
+        Argument | Description
+        -------- | -----------
+        handler  | Callable taking (identifiers, message) to handle a message
+        fast     | The functions that are served on the fast lane
+        coalesce | The functions whose bursts are collapsed into one message
+        window   | Seconds to wait for a burst to finish (0 disables)
+        deadline | Callable taking a message and returning its deadline
+        expired  | Callable taking (identifiers, message) for stuck messages
+
+        """
+
+        self._handler = handler
+        self.fast = set(fast or [])
+        self.coalesce = set(coalesce or [])
+        self.window = float(window or 0)
+
+        self._deadline = deadline
+        self._expired = expired
+
+        self._deferred = {}
+
+        self._queues = {
+                "fast": Queue.Queue(),
+                "slow": Queue.Queue(),
+                }
+
+        self._lock = threading.Lock()
+        self._busy = {}
+        self._claimed = set() # Identifiers a handler is answering.
+        self._abandoned = set() # Identifiers answered by expired.
+        self._generations = dict([ (lane, 0) for lane in self._queues.iterkeys() ]) # pylint: disable=C0301
+
+        self.threads = {}
+
+        for lane in self._queues.iterkeys():
+            self._start(lane)
+
+        if self._deadline is not None:
+            self.threads["watchdog"] = threading.Thread(target = self._watch, name = "watchdog") # pylint: disable=C0301
+            self.threads["watchdog"].daemon = True
+            self.threads["watchdog"].start()
+
+    def _start(self, lane):
+        """Start a new thread serving the passed lane."""
+
+        self._generations[lane] += 1
+
+        self.threads[lane] = threading.Thread(target = self._serve, args = (lane, self._generations[lane]), name = lane) # pylint: disable=C0301
+        self.threads[lane].daemon = True
+        self.threads[lane].start()
+
+    @property
+    def depths(self):
+        """The number of messages waiting on each lane."""
+        return dict([ (lane, queue.qsize()) for lane, queue in self._queues.iteritems() ]) # pylint: disable=C0301
+
+    def lane(self, message):
+        """The lane the passed message is served on."""
+        if message.get("function") in self.fast:
+            return "fast"
+        return "slow"
+
+    def submit(self, identifier, message):
+        """Queue the message on the appropriate lane."""
+
+        lane = self.lane(message)
+
+        logger.info("Queueing message, %s, on the %s lane", identifier, lane)
+
+        self._queues[lane].put((identifier, message, time.time()))
+
+        logger.info("Lane queue lengths: %s", self.depths)
+
+    @property
+    def idle(self):
+        """True if no lane is handling or waiting on a message."""
+        return not len(self._busy) and not len(self._deferred) and not sum(self.depths.values()) # pylint: disable=C0301
+
+    def claim(self, identifiers):
+        """The identifiers (of those passed) the handler should answer.
+
+        ### Description
+
+        Called by the handler before it responds.  Identifiers the watchdog
+        already passed to expired are left out; the rest can no longer be
+        passed to expired.
+
+        """
+
+        with self._lock:
+            claimed = [ identifier for identifier in identifiers if identifier not in self._abandoned ] # pylint: disable=C0301
+            self._claimed.update(claimed)
+
+            return claimed
+
+    def drain(self):
+        """Remove and return the (identifier, message) pairs not yet handled.
+
+        ### Description
+
+        Used when handing off to a successor; messages already being handled
+        are left to finish.
+
+        """
+
+        result = []
+
+        for lane, queue in self._queues.iteritems():
+            deferred = self._deferred.pop(lane, None)
+            if deferred is not None:
+                result.append(deferred[:2])
+
+            while True:
+                try:
+                    result.append(queue.get_nowait()[:2])
+                except Queue.Empty:
+                    break
+
+        return result
+
+    def _serve(self, lane, generation):
+        """Handle messages from the passed lane until replaced."""
+
+        while True:
+            identifier, message, submitted = self._deferred.pop(lane, None) or self._queues[lane].get() # pylint: disable=C0301
+
+            identifiers = [ identifier ]
+
+            if message.get("function") in self.coalesce:
+                message = self._coalesce(lane, identifiers, message, submitted)
+
+            logger.debug("Handling messages, %s, on the %s lane", identifiers, lane) # pylint: disable=C0301
+
+            self._busy[lane] = (time.time(), identifiers, message)
+
+            try:
+                self._handler(identifiers, message)
+            except Exception as error: # pylint: disable=W0703
+                logger.exception(error)
+
+            with self._lock:
+                self._claimed.difference_update(identifiers)
+                self._abandoned.difference_update(identifiers)
+
+                if self._generations[lane] != generation:
+                    logger.warning("Replaced thread for the %s lane finished handling messages, %s; exiting.", lane, identifiers) # pylint: disable=C0301
+                    return
+
+                del self._busy[lane]
+
+    def _watch(self):
+        """Replace lanes stuck on a message past its deadline."""
+
+        while True:
+            time.sleep(WATCHDOG_INTERVAL)
+
+            stuck = []
+
+            with self._lock:
+                for lane, (started, identifiers, message) in self._busy.items():
+                    deadline = self._deadline(message)
+
+                    if not deadline or time.time() - started < deadline + WATCHDOG_GRACE: # pylint: disable=C0301
+                        continue
+
+                    logger.error("The %s lane has been handling messages, %s, for %d seconds (deadline %s); replacing it.", lane, identifiers, time.time() - started, deadline) # pylint: disable=C0301
+
+                    del self._busy[lane]
+                    self._start(lane)
+
+                    # Answered by expired unless the handler got there first.
+                    identifiers = [ identifier for identifier in identifiers if identifier not in self._claimed ] # pylint: disable=C0301
+                    self._abandoned.update(identifiers)
+
+                    if len(identifiers):
+                        stuck.append((identifiers, message))
+
+            for identifiers, message in stuck:
+                if self._expired is None:
+                    continue
+
+                try:
+                    self._expired(identifiers, message)
+                except Exception as error: # pylint: disable=W0703
+                    logger.exception(error)
+
+    def _coalesce(self, lane, identifiers, message, submitted):
+        """Fold a burst of messages into the newest message.
+
+        ### Description
+
+        Adds the identifier of every message folded in to identifiers and
+        returns the newest message.  A message with another function stops the
+        burst and is handled next.
+
+        """
+
+        deadline = submitted + self.window
+
+        while deadline > time.time():
+            try:
+                identifier, newer, submitted = self._queues[lane].get(timeout = deadline - time.time()) # pylint: disable=C0301
+            except Queue.Empty:
+                break
+
+            if newer.get("function") != message.get("function"):
+                self._deferred[lane] = (identifier, newer, submitted)
+                break
+
+            logger.info("Message, %s, supersedes messages, %s", identifier, identifiers) # pylint: disable=C0301
+
+            identifiers.append(identifier)
+            message = newer
+
+        return message
@@ -0,0 +1,91 @@
+# Copyright (C) 2012 by Alex Brandt <alunduil@alunduil.com>
+#
+# singularity is freely distributable under the terms of an MIT-style license.
+# See COPYING or http://www.opensource.org/licenses/mit-license.php.
+
+import logging
+import json
+import os
+
+import singularity.helpers as helpers
+
+from singularity import information
+from singularity.cache import state_path
+
+logger = logging.getLogger("console") # pylint: disable=C0103
+
+def save(configurators):
+    """Write the warm-start snapshot for the next start of the daemon.
+
+    ### Arguments
+
+    Argument      | Description
+    --------      | -----------
+    configurators | The daemon's SingularityConfigurators
+
+    ### Description
+
+    Written when the daemon shuts down cleanly.  The snapshot holds:
+
+    Key      | Description
+    ---      | -----------
+    version  | The version of singularity that wrote the snapshot
+    manifest | The configurators' source manifest (mtime, size and sha1)
+    tools    | The resolved tool paths (see singularity.helpers.which)
+
+    The fingerprints of the last applied functions and the responses already
+    persist on their own in the state directory.
+
+    """
+
+    path = state_path("snapshot")
+
+    snapshot = {
+            "version": information.VERSION,
+            "manifest": configurators.manifest,
+            "tools": helpers.TOOLS,
+            }
+
+    if not os.path.exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+
+    with open(path + ".tmp", "w") as output:
+        json.dump(snapshot, output)
+
+    os.rename(path + ".tmp", path)
+
+    logger.info("Wrote the warm-start snapshot to %s", path)
+
+def load():
+    """Seed the caches from the warm-start snapshot and return it.
+
+    ### Description
+
+    Each item is validated cheaply before it's used: the snapshot must come
+    from this version, tools must still be executable and manifest entries
+    only stand in for a module's sha1 while its mtime and size match (see
+    SingularityConfigurators).  The interface inventory isn't part of the
+    snapshot; it can change across a reboot under the same names.
+
+    Returns an empty dict if there is no usable snapshot.
+
+    """
+
+    path = state_path("snapshot")
+
+    try:
+        with open(path, "r") as snapshot_file:
+            snapshot = json.load(snapshot_file)
+    except (IOError, ValueError) as error:
+        logger.info("No warm-start snapshot loaded from %s: %s", path, error) # pylint: disable=C0301
+        return {}
+
+    if snapshot.get("version") != information.VERSION:
+        logger.info("Ignoring the warm-start snapshot of version %s", snapshot.get("version")) # pylint: disable=C0301
+        return {}
+
+    helpers.TOOLS.update(dict([ (str(name), str(tool)) for name, tool in snapshot["tools"].iteritems() if os.access(tool, os.X_OK) ])) # pylint: disable=C0301
+
+    logger.debug("Warm-start snapshot: %s", snapshot)
+
+    return snapshot
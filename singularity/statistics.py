@@ -0,0 +1,103 @@
+# Copyright (C) 2012 by Alex Brandt <alunduil@alunduil.com>
+#
+# singularity is freely distributable under the terms of an MIT-style license.
+# See COPYING or http://www.opensource.org/licenses/mit-license.php.
+
+import logging
+import collections
+import threading
+
+logger = logging.getLogger("console") # pylint: disable=C0103
+
+# Number of the most recent samples of a timing kept for its percentile.
+SAMPLES = 1000
+
+class SingularityStatistics(object):
+    """Runtime statistics published by the parts of the daemon.
+
+    ### Description
+
+    Shared (borg) state so any module can publish without the daemon passing
+    an object around.  Three kinds of statistics are kept:
+
+    Kind    | Description
+    ----    | -----------
+    counter | Running total (i.e. messages handled for a function)
+    gauge   | Latest value of a quantity or a callable computing it
+    timing  | Durations (i.e. of each configurator run)
+
+    Callable gauges (i.e. queue depths) are only evaluated when a snapshot
+    is taken so publishing them costs nothing.
+
+    ### Examples
+
+    >>> SingularityStatistics().gauge("descriptors", 12)
+    >>> SingularityStatistics().increment("messages.version")
+    >>> SingularityStatistics().snapshot()
+    {'counters': {'messages.version': 1}, 'gauges': {...}, 'timings': {}}
+
+    """
+
+    __shared_state = {}
+
+    def __init__(self):
+        self.__dict__ = self.__shared_state
+
+        if "_lock" not in self.__dict__:
+            self._lock = threading.Lock()
+            self.counters = {}
+            self.gauges = {}
+            self.timings = {}
+
+    def increment(self, name, value = 1):
+        """Add value to the counter, name."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge(self, name, value):
+        """Set the gauge, name, to value (or a callable returning it)."""
+        with self._lock:
+            self.gauges[name] = value
+
+    def time(self, name, seconds):
+        """Record a duration, in seconds, of the timing, name."""
+        with self._lock:
+            count, samples = self.timings.setdefault(name, [ 0, collections.deque(maxlen = SAMPLES) ]) # pylint: disable=C0301,W0612
+            self.timings[name][0] += 1
+            samples.append(seconds)
+
+    def snapshot(self):
+        """Copy of the statistics suitable for serializing.
+
+        ### Description
+
+        Timings are summarized as their count, last duration and the 99th
+        percentile of the most recent SAMPLES durations.
+
+        """
+
+        with self._lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            timings = dict([ (name, (count, list(samples))) for name, (count, samples) in self.timings.iteritems() ]) # pylint: disable=C0301
+
+        for name, value in gauges.items():
+            if callable(value):
+                try:
+                    gauges[name] = value()
+                except Exception as error: # pylint: disable=W0703
+                    logger.exception(error)
+                    gauges[name] = None
+
+        return {
+                "counters": counters,
+                "gauges": gauges,
+                "timings": dict([ (name, { "count": count, "last": samples[-1], "p99": percentile(samples, 99) }) for name, (count, samples) in timings.iteritems() ]), # pylint: disable=C0301
+                }
+
+def percentile(samples, percent):
+    """The nearest-rank percent percentile of samples."""
+
+    ordered = sorted(samples)
+
+    return ordered[max(0, int(round(percent / 100.0 * len(ordered))) - 1)]
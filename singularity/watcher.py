@@ -0,0 +1,170 @@
+# Copyright (C) 2012 by Alex Brandt <alunduil@alunduil.com>
+#
+# singularity is freely distributable under the terms of an MIT-style license.
+# See COPYING or http://www.opensource.org/licenses/mit-license.php.
+
+import logging
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import threading
+import time
+
+logger = logging.getLogger("console") # pylint: disable=C0103
+
+# Constants from <sys/inotify.h>.
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+EVENT = struct.Struct("iIII") # wd, mask, cookie, len (of the name that follows)
+
+# Name of the configuration file watched in the configuration directory.
+CONFIGURATION = "singularity.conf"
+
+class SingularityWatcher(object):
+    """Calls back when the configuration or a configurator's source changes.
+
+    ### Description
+
+    Watches (with inotify) each directory in directories and its
+    subdirectories.  Writes, moves, creations and deletions of the
+    configuration file, python sources or directories are collected until
+    no further change has been seen for debounce seconds and then callback
+    is called once (i.e. an editor's temporary file dance or an unpacked
+    package of configurators causes a single reload).
+
+    A debounce of 0 disables the watcher.  Changing directories or debounce
+    takes effect after the next change is seen.
+
+    ### Examples
+
+    >>> watcher = SingularityWatcher([ "/etc/singularity" ], reload, 1)
+
+    """
+
+    def __init__(self, directories, callback, debounce = 0):
+        self.directories = list(directories)
+        self.debounce = float(debounce or 0)
+
+        self._callback = callback
+        self._watches = {}
+
+        self.thread = None
+
+        self.start()
+
+    def start(self):
+        """Start watching unless disabled, unsupported or already watching."""
+
+        if not self.debounce or self.thread is not None and self.thread.is_alive(): # pylint: disable=C0301
+            return
+
+        if _LIBC is None or not hasattr(_LIBC, "inotify_init1"):
+            logger.warning("inotify is not available; changes will not be reloaded automatically.") # pylint: disable=C0301
+            return
+
+        self.thread = threading.Thread(target = self._serve, name = "watcher")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _serve(self):
+        """Collect events and call back once they settle."""
+
+        descriptor = _LIBC.inotify_init1(IN_CLOEXEC)
+        if descriptor < 0:
+            logger.error("Unable to initialize inotify: %s", os.strerror(ctypes.get_errno())) # pylint: disable=C0301
+            return
+
+        self._watches = {}
+
+        try:
+            self._watch(descriptor)
+
+            changed = None
+
+            while self.debounce:
+                timeout = None
+                if changed is not None:
+                    timeout = max(0, changed + self.debounce - time.time())
+
+                try:
+                    readable = select.select([ descriptor ], [], [], timeout)[0]
+                except select.error as error:
+                    if error.args[0] == errno.EINTR:
+                        continue
+                    raise
+
+                if len(readable):
+                    if self._read(descriptor):
+                        changed = time.time()
+                    continue
+
+                logger.info("Configuration changed; reloading.")
+
+                changed = None
+
+                try:
+                    self._callback()
+                except Exception as error: # pylint: disable=W0703
+                    logger.exception(error)
+
+                self._watch(descriptor)
+        finally:
+            os.close(descriptor)
+
+    def _watch(self, descriptor):
+        """Add watches for the directories and their subdirectories."""
+
+        for directory in self.directories:
+            for path, dirnames, filenames in os.walk(directory): # pylint: disable=W0612,C0301
+                dirnames[:] = [ dirname for dirname in dirnames if not dirname.startswith(".") ] # pylint: disable=C0301
+
+                watch = _LIBC.inotify_add_watch(descriptor, path, MASK)
+                if watch < 0:
+                    logger.warning("Unable to watch %s: %s", path, os.strerror(ctypes.get_errno())) # pylint: disable=C0301
+                    continue
+
+                self._watches[watch] = path
+
+        logger.debug("Watched directories: %s", self._watches.values())
+
+    def _read(self, descriptor):
+        """Read the pending events and return True if any are relevant."""
+
+        buffer_ = os.read(descriptor, 4096)
+        relevant = False
+
+        offset = 0
+        while offset < len(buffer_):
+            watch, mask, cookie, length = EVENT.unpack_from(buffer_, offset) # pylint: disable=W0612,C0301
+            offset += EVENT.size
+
+            name = buffer_[offset:offset + length].rstrip("\0")
+            offset += length
+
+            if name == CONFIGURATION or name.endswith(".py") or mask & IN_ISDIR: # pylint: disable=C0301
+                logger.debug("Change (%#x) to %s in %s", mask, name, self._watches.get(watch)) # pylint: disable=C0301
+                relevant = True
+
+        return relevant
+
+def _libc():
+    """The C library (for the inotify calls) or None."""
+
+    try:
+        return ctypes.CDLL(ctypes.util.find_library("c"), use_errno = True)
+    except OSError as error:
+        logger.warning("Unable to load the C library: %s", error)
+        return None
+
+_LIBC = _libc()